@@ -1,11 +1,42 @@
 # Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import copy
+import hashlib
 import io
 import json
-import re
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
 
+import numpy as np
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
+
+from analytics import ScheduleAnalytics
+from conflicts import max_itinerary, overlapping_pairs
+from excel import write_excel
+from extract import extract_events
+from filters import FilterIndex
+from ics import VEVENTS_VERSION, iter_calendar, render_vevents
+from normalize import compact_table, normalize_events, plain_table
+from profiling import span
+from search import SearchIndex
+from similar import SimilarEvents
+from snapshot import SnapshotManifest, SnapshotStore
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CACHE_DIR = os.getenv("AIEWF_CACHE_DIR", "aiewf_cache")
+DEFAULT_CACHE_TTL = float(os.getenv("AIEWF_CACHE_TTL", 3600))
+FETCH_TIMEOUT = 30
+FETCH_RETRIES = 2
+COMPACT_TABLES = bool(int(os.getenv("AIEWF_COMPACT_TABLES", 1)))
+
+logger = logging.getLogger(__name__)
 
 
 def fix_social_link(link: str) -> str:
@@ -19,106 +50,527 @@ def fix_social_link(link: str) -> str:
     return f"https://{link}"
 
 
+def get_event_key(event: dict) -> str:
+    if event.get("slug"):
+        return event["slug"]
+    key_str = f"{event.get('title')}|{event.get('since')}"
+    return "event-" + hashlib.sha1(key_str.encode()).hexdigest()[:12]
+
+
+def get_event_hash(event: dict) -> str:
+    return hashlib.sha1(json.dumps(event, sort_keys=True).encode()).hexdigest()
+
+
+def as_int64(timestamps: pd.Series) -> np.ndarray:
+    return timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def sorted_unique(values: pd.Series) -> list:
+    return sorted(values.dropna().unique().tolist())
+
+
+def upsert_rows(df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    existing = new_df.index.isin(df.index)
+    # updated values may be missing from the categories, set_tables compacts the result again
+    df = df.astype({col: object for col in df.select_dtypes("category").columns})
+    df.loc[new_df.index[existing]] = new_df[existing]
+    if existing.all():
+        return df
+    return pd.concat([df, new_df[~existing]])
+
+
+@dataclass
+class ScheduleChanges:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+@dataclass(frozen=True)
+class ScheduleSource:
+    edition: str
+    schedule_url: str
+    timeout: float = FETCH_TIMEOUT
+    retries: int = FETCH_RETRIES
+
+    @property
+    def event_base_url(self) -> str:
+        return self.schedule_url.rstrip("/") + "/"
+
+
+WORLDS_FAIR_2024 = ScheduleSource(
+    "worldsfair-2024", "https://www.ai.engineer/worldsfair/2024/schedule"
+)
+
+
+def mount_retries(session: "requests.Session", source: ScheduleSource, pool_size: int = 10) -> None:
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=source.retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount(source.schedule_url, adapter)
+
+
 class AIEWF:
-    schedule_url = "https://www.ai.engineer/worldsfair/2024/schedule"
-    event_base_url = "https://www.ai.engineer/worldsfair/2024/schedule/"
+    schedule_url = WORLDS_FAIR_2024.schedule_url
+    event_base_url = WORLDS_FAIR_2024.event_base_url
+    compact_tables = COMPACT_TABLES
+
+    def __init__(
+        self,
+        cache_dir: str | None = DEFAULT_CACHE_DIR,
+        max_age: float = DEFAULT_CACHE_TTL,
+        offline: bool = False,
+        source: ScheduleSource = WORLDS_FAIR_2024,
+        session: "requests.Session | None" = None,
+    ):
+        store = SnapshotStore(os.path.join(cache_dir, source.edition)) if cache_dir else None
+        self.init_state(source, session, store)
+        with span("load"):
+            manifest = self.store.read_manifest() if self.store else None
+            if manifest is not None and manifest.source_url != self.schedule_url:
+                manifest = None
+
+            if manifest is not None and (offline or manifest.age < max_age):
+                if self.load_snapshot(manifest):
+                    return
+                manifest = None
+            if offline:
+                raise ValueError(f"No usable snapshot found in {cache_dir}")
+
+            import requests
+
+            try:
+                if manifest is None:
+                    response = self.fetch()
+                else:
+                    response = self.fetch(manifest.etag, manifest.last_modified)
+            except requests.RequestException:
+                if manifest is None or not self.load_snapshot(manifest):
+                    raise
+                logger.warning("Fetching %s failed, using the cached snapshot", self.schedule_url)
+                return
+            if response.status_code == 304:
+                if self.load_snapshot(manifest):
+                    self.touch_snapshot()
+                    return
+                response = self.fetch()
+
+            try:
+                self.parse(response.content)
+            except Exception:
+                # e.g. a maintenance page or a changed page layout
+                if manifest is None or not self.load_snapshot(manifest):
+                    raise
+                logger.exception("Could not parse %s, using the cached snapshot", self.schedule_url)
+                return
+            self.set_fetch_info(response)
+            self.save_snapshot()
+
+    def init_state(
+        self,
+        source: ScheduleSource,
+        session: "requests.Session | None" = None,
+        store: SnapshotStore | None = None,
+    ) -> None:
+        # the source, fetch and lock state shared by all subclasses, the tables are set later
+        self.source = source
+        self.schedule_url = source.schedule_url
+        self.event_base_url = source.event_base_url
+        self.session = session
+        self.store = store
+        self.data_version = ""
+        self.fetched_at = 0.0
+        self.etag = ""
+        self.last_modified = ""
+        self.refresh_lock = threading.Lock()
+        self.tables_lock = threading.RLock()
+
+    def fetch(self, etag: str = "", last_modified: str = "") -> "requests.Response":
+        # requests is only imported when the schedule is fetched, a fresh snapshot loads without it
+        import requests
 
-    def __init__(self):
-        session = requests.Session()
-        response = session.get(self.schedule_url)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with span("fetch"):
+            if self.session is not None:
+                response = self.session.get(
+                    self.schedule_url, headers=headers, timeout=self.source.timeout
+                )
+            else:
+                with requests.Session() as session:
+                    mount_retries(session, self.source)
+                    response = session.get(
+                        self.schedule_url, headers=headers, timeout=self.source.timeout
+                    )
         response.raise_for_status()
-        html = response.text
+        return response
 
-        soup = BeautifulSoup(html, "lxml")
-        for script_block in soup.find_all("script", id="__NEXT_DATA__"):
-            json_str = script_block.text
-            break
-        else:
-            raise ValueError("No data found")
+    def set_fetch_info(self, response: "requests.Response") -> None:
+        self.fetched_at = time.time()
+        self.etag = response.headers.get("ETag", "")
+        self.last_modified = response.headers.get("Last-Modified", "")
 
-        data = json.loads(json_str)
+    def load_snapshot(self, manifest: SnapshotManifest) -> bool:
         try:
-            events = data["props"]["pageProps"]["schedule"]["events"]
-        except KeyError as e:
-            raise ValueError("Data has an unexpected format") from e
-
-        event_cols = [
-            "title",
-            "trackName",
-            "presenters",
-            "company",
-            "room",
-            "since",
-            "link",
-            "about",
-            "till",
-            "slug",
-        ]
-        event_records = []
-        self.presenter_dict = {}
-        self.company_dict = {}
-        for event in events:
-            event_data = {k: v for k, v in event.items() if k in event_cols}
-            if event_data["slug"]:
-                event_data["link"] = self.event_base_url + event_data["slug"]
-            del event_data["slug"]
-            event_data["about"] = (
-                event_data["about"].replace("\n", " ").replace("  ", " ")
-                if event_data["about"]
-                else ""
+            with span("load snapshot"):
+                tables = self.store.load_tables(manifest)
+        except (OSError, ValueError):
+            logger.exception("Could not read the schedule snapshot from %s", self.store.path)
+            return False
+        self.set_tables(
+            data_version=manifest.data_version,
+            event_df=tables["events"],
+            presenter_table=tables["presenters"],
+            company_table=tables["companies"],
+            event_presenters=tables["event_presenters"],
+            event_hashes=tables["event_meta"]["hash"].to_dict(),
+        )
+        self.fetched_at = manifest.fetched_at
+        self.etag = manifest.etag
+        self.last_modified = manifest.last_modified
+        return True
+
+    def save_snapshot(self) -> None:
+        if self.store is None:
+            return
+        manifest = SnapshotManifest(
+            source_url=self.schedule_url,
+            data_version=self.data_version,
+            fetched_at=self.fetched_at,
+            etag=self.etag,
+            last_modified=self.last_modified,
+        )
+        try:
+            with span("save snapshot"):
+                self.store.save(self.snapshot_tables(), manifest)
+        except OSError:
+            logger.exception("Could not write the schedule snapshot to %s", self.store.path)
+
+    def touch_snapshot(self) -> None:
+        self.fetched_at = time.time()
+        if self.store is None:
+            return
+        manifest = self.store.read_manifest()
+        if manifest is not None and manifest.data_version == self.data_version:
+            self.store.touch(manifest)
+
+    def snapshot_tables(self) -> dict[str, pd.DataFrame]:
+        event_meta = pd.DataFrame({"hash": pd.Series(self.event_hashes, dtype=object)})
+        return {
+            "events": self.event_df,
+            "presenters": self.presenter_table,
+            "companies": self.company_table,
+            "event_presenters": self.event_presenters,
+            "event_meta": event_meta.rename_axis("slug"),
+        }
+
+    def set_tables(
+        self,
+        data_version: str,
+        event_df: pd.DataFrame,
+        presenter_table: pd.DataFrame,
+        company_table: pd.DataFrame,
+        event_presenters: pd.DataFrame,
+        event_hashes: dict[str, str],
+    ) -> None:
+        with span("build tables"):
+            if self.compact_tables:
+                event_df = compact_table(event_df, "events")
+                presenter_table = compact_table(presenter_table, "presenters")
+                company_table = compact_table(company_table, "companies")
+                event_presenters = compact_table(event_presenters, "event_presenters")
+            else:
+                event_df = plain_table(event_df)
+                presenter_table = plain_table(presenter_table)
+                company_table = plain_table(company_table)
+                event_presenters = plain_table(event_presenters)
+            filter_index = FilterIndex(event_df, event_presenters)
+            # the facet lists are read on every app rerun, so they are computed once per data
+            # version
+            facets = {
+                "tracks": sorted_unique(event_df["trackName"]),
+                "companies": sorted_unique(company_table["name"]),
+                "event_rooms": sorted_unique(event_df["room"]),
+                "dates": sorted_unique(event_df["date"]),
+                "num_presenters": presenter_table["name"].nunique(),
+            }
+        with self.tables_lock:
+            self.event_hashes = event_hashes
+            self.event_presenters = event_presenters
+            self.presenter_table = presenter_table
+            self.company_table = company_table
+            self.presenter_df = presenter_table.reset_index(drop=True)
+            self.company_df = company_table.reset_index(drop=True)
+            self.event_df = event_df
+            self.filter_index = filter_index
+            self.facets = facets
+            self._search_index = None
+            self._similar_events = None
+            self._analytics = None
+            self._vevents = None
+            self.data_version = data_version
+
+    def filter_events(
+        self,
+        tracks: list[str] | None = None,
+        dates: list | None = None,
+        rooms: list[str] | None = None,
+        companies: list[str] | None = None,
+        editions: list[str] | None = None,
+    ) -> np.ndarray:
+        # row positions into event_df, an empty selection does not filter
+        if companies:
+            companies = [company.strip() for company in companies]
+        with span("filter"):
+            return self.filter_index.select(
+                edition=editions, track=tracks, date=dates, room=rooms, company=companies
             )
-            presenter_names = set()
-            presenter_companies = set()
-            for presenter in event["presenters"]:
-                presenter_data = presenter["attributes"]
-                presenter_data["socialLinks"] = fix_social_link(
-                    presenter_data.get("socialLinks", "")
+
+    def view(self, derived: Iterable[str] = ()) -> "AIEWF":
+        # A shallow copy holding the tables of the current data version and the given derived
+        # structures, e.g. "search_index". A refresh replaces the tables of self but not those of
+        # the copy, so row positions taken from it stay valid, e.g. during one app rerun.
+        with self.tables_lock:
+            for name in derived:
+                getattr(self, name)
+            return copy.copy(self)
+
+    def get_derived(self, name: str, build: Callable, version: int):
+        # Derived structures are built once per data version and persisted in the snapshot. Their
+        # pickles are only loaded for the same version of the class, e.g. SearchIndex.VERSION.
+        if self.store is not None:
+            obj = self.store.load_object(self.data_version, name, version)
+            if obj is not None:
+                return obj
+        with span(f"build {name}"):
+            obj = build()
+        if self.store is not None:
+            try:
+                self.store.save_object(self.data_version, name, obj, version)
+            except OSError:
+                logger.exception("Could not write %s to %s", name, self.store.path)
+        return obj
+
+    @property
+    def search_index(self) -> SearchIndex:
+        with self.tables_lock:
+            if self._search_index is None:
+                self._search_index = self.get_derived(
+                    "search_index",
+                    lambda: SearchIndex(
+                        self.data_version,
+                        self.event_df,
+                        self.event_presenters,
+                        self.presenter_table,
+                    ),
+                    SearchIndex.VERSION,
+                )
+            return self._search_index
+
+    @property
+    def similar_events(self) -> SimilarEvents:
+        with self.tables_lock:
+            if self._similar_events is None:
+                self._similar_events = self.get_derived(
+                    "similar_events",
+                    lambda: SimilarEvents(self.data_version, self.event_df, self.event_presenters),
+                    SimilarEvents.VERSION,
+                )
+            return self._similar_events
+
+    @property
+    def analytics(self) -> ScheduleAnalytics:
+        with self.tables_lock:
+            if self._analytics is None:
+                self._analytics = self.get_derived(
+                    "analytics",
+                    lambda: ScheduleAnalytics(
+                        self.data_version, self.event_df, self.event_presenters
+                    ),
+                    ScheduleAnalytics.VERSION,
                 )
+            return self._analytics
 
-                presenter_about = presenter_data["about"]
-                presenter_data["about"] = (
-                    presenter_about.replace("\n", " ").replace("  ", " ")
-                    if (presenter_about)
-                    else ""
+    @property
+    def vevents(self) -> pd.Series:
+        with self.tables_lock:
+            if self._vevents is None:
+                uid_domain = urlsplit(self.event_base_url).hostname or "aiewf"
+                self._vevents = self.get_derived(
+                    "vevents",
+                    lambda: render_vevents(self.event_df, uid_domain, self.fetched_at),
+                    VEVENTS_VERSION,
                 )
-                presenter_names.add(presenter_data["name"].strip())
-                self.presenter_dict[presenter["id"]] = presenter_data
-                company_data = presenter_data["company"]["data"]
-                company_id = company_data["id"]
-                company_data = company_data["attributes"]
-                company_data["socialLinks"] = fix_social_link(company_data.get("socialLinks", ""))
-                company_data["link"] = fix_social_link(company_data.get("link", ""))
-                presenter_data["company"] = company_data["name"]
-                presenter_companies.add(company_data["name"].strip())
-                if company_id not in self.company_dict:
-                    self.company_dict[company_id] = company_data
-                self.presenter_dict[presenter["id"]] = presenter_data
-            event_data["presenters"] = ", ".join(presenter_names)
-            event_data["company"] = ", ".join(presenter_companies)
-            event_records.append(event_data)
-
-        event_cols.remove("slug")
-        self.event_df = pd.DataFrame.from_records(event_records, columns=event_cols)
-        self.event_df["since"] = pd.to_datetime(self.event_df["since"])
-        self.event_df["till"] = pd.to_datetime(self.event_df["till"])
-        self.event_df["date"] = self.event_df["since"].dt.date
-        self.event_df["room"] = self.event_df["room"].fillna("Unknown")
-        self.event_df["presenters"] = self.event_df["presenters"].fillna("NA")
-        self.event_df["company"] = self.event_df["company"].fillna("NA")
-        self.event_df.sort_values(by="since", inplace=True, ascending=True)
-        self.presenter_df = pd.DataFrame.from_records(
-            list(self.presenter_dict.values()),
-            columns=["name", "tagline", "company", "socialLinks", "about"],
+            return self._vevents
+
+    def iter_ics(self, positions: np.ndarray | None = None, name: str = "") -> Iterator[str]:
+        # streams an iCalendar file of the events at the given event_df positions
+        vevents = self.vevents
+        if positions is not None:
+            vevents = vevents.iloc[positions]
+        return iter_calendar(vevents, name)
+
+    def search(self, query: str, limit: int | None = 20) -> pd.DataFrame:
+        positions, scores = self.search_index.search(query, limit)
+        return self.event_df.iloc[positions].assign(score=scores)
+
+    def similar(self, slug: str, limit: int | None = 5) -> pd.DataFrame:
+        positions, scores = self.similar_events.similar(self.event_df.index.get_loc(slug), limit)
+        return self.event_df.iloc[positions].assign(score=scores)
+
+    def recommend(self, positions: np.ndarray, limit: int | None = 10) -> pd.DataFrame:
+        # events similar to a set of events, e.g. the favorites of a user
+        positions, scores = self.similar_events.recommend(positions, limit)
+        return self.event_df.iloc[positions].assign(score=scores)
+
+    def select_timed_events(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        event_df = self.event_df if positions is None else self.event_df.iloc[positions]
+        return event_df[event_df["since"].notna() & event_df["till"].notna()]
+
+    @staticmethod
+    def event_pairs(event_df: pd.DataFrame, pairs: np.ndarray) -> pd.DataFrame:
+        cols = ["title", "room", "since", "till"]
+        first = event_df.iloc[pairs[:, 0]][cols].reset_index()
+        second = event_df.iloc[pairs[:, 1]][cols].reset_index()
+        return first.join(second, lsuffix="_1", rsuffix="_2")
+
+    def find_conflicts(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        # all pairs of overlapping events, e.g. among the favorites of a user
+        event_df = self.select_timed_events(positions)
+        pairs = overlapping_pairs(as_int64(event_df["since"]), as_int64(event_df["till"]))
+        return self.event_pairs(event_df, pairs)
+
+    def find_room_double_bookings(self) -> pd.DataFrame:
+        event_df = self.select_timed_events()
+        event_df = event_df[event_df["room"] != "Unknown"]
+        room_cols = [col for col in ("edition", "room") if col in event_df]
+        rooms = event_df.groupby(room_cols, sort=False, observed=True).ngroup().to_numpy()
+        pairs = overlapping_pairs(as_int64(event_df["since"]), as_int64(event_df["till"]), rooms)
+        return self.event_pairs(event_df, pairs)
+
+    def build_itinerary(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        # a largest possible set of events without overlaps
+        event_df = self.select_timed_events(positions)
+        selected = max_itinerary(as_int64(event_df["since"]), as_int64(event_df["till"]))
+        return event_df.iloc[selected]
+
+    @property
+    def presenter_dict(self) -> dict:
+        return self.presenter_table.to_dict("index")
+
+    @property
+    def company_dict(self) -> dict:
+        return self.company_table.to_dict("index")
+
+    @staticmethod
+    def key_events(events: list[dict]) -> dict[str, dict]:
+        keyed_events = {}
+        for event in events:
+            key = base_key = get_event_key(event)
+            i = 1
+            while key in keyed_events:
+                i += 1
+                key = f"{base_key}-{i}"
+            keyed_events[key] = event
+        return keyed_events
+
+    def parse(self, html: bytes | str) -> None:
+        events, data_version = extract_events(html)
+        keyed_events = self.key_events(events)
+        with span("normalize"):
+            normalized = normalize_events(keyed_events, self.event_base_url)
+        self.set_tables(
+            data_version=data_version,
+            event_df=normalized.event_df,
+            presenter_table=normalized.presenter_table,
+            company_table=normalized.company_table,
+            event_presenters=normalized.event_presenters,
+            event_hashes={key: get_event_hash(event) for key, event in keyed_events.items()},
         )
-        self.presenter_df.fillna("", inplace=True)
-        self.company_df = pd.DataFrame.from_records(
-            list(self.company_dict.values()), columns=["name", "link", "socialLinks"]
+
+    def refresh(self) -> ScheduleChanges:
+        with self.refresh_lock, span("refresh"):
+            response = self.fetch(self.etag, self.last_modified)
+            if response.status_code == 304:
+                self.touch_snapshot()
+                return ScheduleChanges()
+            events, data_version = extract_events(response.content)
+            if data_version == self.data_version:
+                self.set_fetch_info(response)
+                return ScheduleChanges()
+            changes = self.apply_events(events, data_version)
+            # only now, a failed update must not be hidden by a 304 on the next refresh
+            self.set_fetch_info(response)
+            self.save_snapshot()
+            return changes
+
+    def apply_events(self, events: list[dict], data_version: str) -> ScheduleChanges:
+        keyed_events = self.key_events(events)
+        event_hashes = {key: get_event_hash(event) for key, event in keyed_events.items()}
+        changes = ScheduleChanges(
+            added=[key for key in event_hashes if key not in self.event_hashes],
+            removed=[key for key in self.event_hashes if key not in event_hashes],
+            modified=[
+                key
+                for key, event_hash in event_hashes.items()
+                if key in self.event_hashes and self.event_hashes[key] != event_hash
+            ],
         )
-        self.company_df.fillna("", inplace=True)
+        if not changes:
+            with self.tables_lock:
+                self.event_hashes = event_hashes
+                self.data_version = data_version
+            return changes
+
+        # Only the added and modified events are normalized again. The new tables are swapped in
+        # at the end, so concurrent readers never see a partially updated schedule.
+        dropped_slugs = changes.removed + changes.modified
+        event_df = self.event_df.drop(index=dropped_slugs)
+        event_presenters = self.event_presenters[~self.event_presenters["slug"].isin(dropped_slugs)]
+        presenter_table = self.presenter_table
+        company_table = self.company_table
+        changed_events = {key: keyed_events[key] for key in changes.added + changes.modified}
+        if changed_events:
+            with span("normalize"):
+                changed = normalize_events(changed_events, self.event_base_url)
+            # back in page order before the stable sort, so that events starting at the same time
+            # are in the same order as after a fresh load
+            event_df = pd.concat([event_df, changed.event_df]).loc[list(keyed_events)]
+            event_df = event_df.sort_values(by="since", kind="stable")
+            event_presenters = pd.concat([event_presenters, changed.event_presenters])
+            presenter_table = upsert_rows(presenter_table, changed.presenter_table)
+            company_table = upsert_rows(company_table, changed.company_table)
+        event_presenters = event_presenters.reset_index(drop=True)
+        presenter_table = presenter_table[
+            presenter_table.index.isin(event_presenters["presenter_id"])
+        ]
+        company_table = company_table[company_table.index.isin(event_presenters["company_id"])]
+        self.set_tables(
+            data_version=data_version,
+            event_df=event_df,
+            presenter_table=presenter_table,
+            company_table=company_table,
+            event_presenters=event_presenters,
+            event_hashes=event_hashes,
+        )
+        return changes
 
     @property
     def num_presenters(self) -> int:
-        return len(self.presenter_df["name"].unique())
+        return self.facets["num_presenters"]
 
     @property
     def num_events(self) -> int:
@@ -126,19 +578,19 @@ class AIEWF:
 
     @property
     def tracks(self) -> list[str]:
-        return sorted(self.event_df["trackName"].unique().tolist())
+        return self.facets["tracks"]
 
     @property
     def companies(self) -> list[str]:
-        return sorted(self.company_df["name"].unique().tolist())
+        return self.facets["companies"]
 
     @property
     def event_rooms(self) -> list[str]:
-        return sorted(self.event_df["room"].unique().tolist())
+        return self.facets["event_rooms"]
 
     @property
     def dates(self) -> list[str]:
-        return sorted(self.event_df["date"].unique().tolist())
+        return self.facets["dates"]
 
 
 def convert_dataframe_to_csv(df: pd.DataFrame, include_index: bool = False) -> str:
@@ -153,37 +605,30 @@ def convert_dataframe_to_excel(df: pd.DataFrame, include_index: bool = False) ->
     return buffer.getvalue()
 
 
-def clean_excel_sheet_name(input_str, sheet_index: int) -> str:
-    cleaned_str = re.sub(r'[\/:*?"<>|]', "_", input_str)
-    cleaned_str = re.sub(r'[\'"]', "", cleaned_str)
-    cleaned_str = cleaned_str.strip()
+def convert_df_dict_to_excel(dfs: dict[str, pd.DataFrame], adjust_col_width: bool = False) -> bytes:
+    buffer = io.BytesIO()
+    write_excel(dfs, buffer, adjust_col_width=adjust_col_width)
+    return buffer.getvalue()
 
-    if len(cleaned_str) == 0:
-        cleaned_str = f"Sheet{sheet_index}"
-    elif len(cleaned_str) > 31:
-        cleaned_str = cleaned_str[:31]
 
-    return cleaned_str
+def refresh_periodically(db: AIEWF, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            changes = db.refresh()
+        except Exception:
+            logger.exception("Schedule refresh failed")
+            continue
+        if changes:
+            logger.info(
+                "Schedule updated: %d added, %d removed, %d modified",
+                len(changes.added),
+                len(changes.removed),
+                len(changes.modified),
+            )
 
 
-def convert_df_dict_to_excel(dfs: dict[str, pd.DataFrame], adjust_col_width: bool = False) -> bytes:
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer) as writer:
-        for i, (sheet_name, df) in enumerate(dfs.items()):
-            sheet_name = clean_excel_sheet_name(sheet_name, i)
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            if not adjust_col_width:
-                continue
-            worksheet = writer.sheets[sheet_name]
-            for col_index, col in enumerate(df):
-                max_len = (
-                    max(
-                        (
-                            df[col].astype(str).map(len).max(),  # len of largest item
-                            len(str(df[col].name)),  # len of column name/header
-                        )
-                    )
-                    + 1
-                )  # adding a little extra space
-                worksheet.set_column(col_index, col_index, max_len)  # set column width
-    return buffer.getvalue()
+def start_refresh_thread(db: AIEWF, interval: float) -> threading.Thread:
+    thread = threading.Thread(target=refresh_periodically, args=(db, interval), daemon=True)
+    thread.start()
+    return thread
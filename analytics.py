@@ -0,0 +1,137 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Schedule aggregates for the app charts. The expensive part, splitting events into time buckets
+# and encoding rooms, tracks, dates and companies as integer codes, happens once per data
+# version. Every row of the cached arrays keeps the event_df position it comes from, so the
+# charts of any filtered selection of events are np.bincount sums over the selected rows.
+import numpy as np
+import pandas as pd
+
+BUCKET_MINUTES = 30
+MINUTE_NS = 60 * 10**9
+NUM_TOP_COMPANIES = 20
+
+
+def wall_time_ns(timestamps: pd.Series) -> np.ndarray:
+    # local wall time of the schedule, also for timezone aware timestamps
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class ScheduleAnalytics:
+    VERSION = 1
+
+    def __init__(
+        self,
+        data_version: str,
+        event_df: pd.DataFrame,
+        event_presenters: pd.DataFrame,
+        bucket_minutes: int = BUCKET_MINUTES,
+    ):
+        self.data_version = data_version
+        self.num_events = len(event_df)
+        self.bucket_minutes = bucket_minutes
+        bucket_ns = bucket_minutes * MINUTE_NS
+        timed = (event_df["since"].notna() & event_df["till"].notna()).to_numpy()
+        since = wall_time_ns(event_df["since"])
+        till = wall_time_ns(event_df["till"])
+        timed = timed & (till > since)
+        positions = np.flatnonzero(timed)
+        since, till = since[timed], till[timed]
+
+        self.room_codes, self.rooms = pd.factorize(event_df["room"].astype(object), sort=True)
+        self.track_codes, self.tracks = pd.factorize(
+            event_df["trackName"].astype(object), sort=True
+        )
+        self.date_codes, self.dates = pd.factorize(event_df["date"].astype(object), sort=True)
+        self.durations = np.zeros(self.num_events)
+        self.durations[positions] = (till - since) / MINUTE_NS
+
+        # one row per event and time bucket it overlaps, with the minutes of the overlap
+        first_bucket = since // bucket_ns
+        num_buckets = -(-till // bucket_ns) - first_bucket
+        rows = np.repeat(np.arange(len(positions)), num_buckets)
+        row_starts = np.cumsum(num_buckets) - num_buckets
+        buckets = first_bucket[rows] + np.arange(len(rows)) - np.repeat(row_starts, num_buckets)
+        overlap = np.minimum(till[rows], (buckets + 1) * bucket_ns) - np.maximum(
+            since[rows], buckets * bucket_ns
+        )
+        self.bucket_positions = positions[rows]
+        self.bucket_codes, bucket_values = pd.factorize(buckets, sort=True)
+        self.bucket_times = pd.to_datetime(bucket_values * bucket_ns)
+        self.bucket_minutes_used = overlap / MINUTE_NS
+
+        # start and end of every timed event as +1/-1 steps in time order
+        times = np.concatenate([since, till])
+        order = np.lexsort((np.r_[np.ones(len(since)), -np.ones(len(till))], times))
+        self.step_times = times[order]
+        self.step_deltas = np.r_[np.ones(len(since)), -np.ones(len(till))][order]
+        self.step_positions = np.concatenate([positions, positions])[order]
+
+        slugs = event_df.index.get_indexer(event_presenters["slug"])
+        pairs = pd.DataFrame({"position": slugs, "company": event_presenters["company"]})
+        pairs = pairs[(pairs["position"] >= 0) & pairs["company"].notna()]
+        pairs = pairs[pairs["company"].astype(str).str.strip() != ""]
+        pairs = pairs.astype({"company": object}).drop_duplicates()
+        self.company_positions = pairs["position"].to_numpy()
+        self.company_codes, self.companies = pd.factorize(pairs["company"], sort=True)
+
+    def selection(self, positions: np.ndarray | None) -> np.ndarray:
+        selected = np.ones(self.num_events, dtype=bool)
+        if positions is not None:
+            selected[:] = False
+            selected[positions] = True
+        return selected
+
+    def room_occupancy(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        # share of every time bucket a room is in use, buckets as rows and rooms as columns
+        selected = self.selection(positions)[self.bucket_positions]
+        selected &= self.room_codes[self.bucket_positions] >= 0
+        num_buckets = len(self.bucket_times)
+        keys = self.room_codes[self.bucket_positions] * num_buckets + self.bucket_codes
+        minutes = np.bincount(
+            keys[selected],
+            weights=self.bucket_minutes_used[selected],
+            minlength=len(self.rooms) * num_buckets,
+        )
+        occupancy = minutes.reshape(len(self.rooms), num_buckets).T / self.bucket_minutes
+        df = pd.DataFrame(occupancy, index=self.bucket_times, columns=self.rooms)
+        df = df.loc[:, df.sum() > 0]
+        return df.rename_axis(index="time", columns="room")
+
+    def track_load(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        # hours of talks per day and track
+        selected = self.selection(positions) & (self.date_codes >= 0) & (self.track_codes >= 0)
+        keys = self.date_codes[selected] * len(self.tracks) + self.track_codes[selected]
+        hours = np.bincount(
+            keys,
+            weights=self.durations[selected] / 60,
+            minlength=len(self.dates) * len(self.tracks),
+        )
+        df = pd.DataFrame(
+            hours.reshape(len(self.dates), len(self.tracks)),
+            index=pd.Index(self.dates, name="date"),
+            columns=pd.Index(self.tracks, name="track"),
+        )
+        return df.loc[df.sum(axis=1) > 0, df.sum() > 0]
+
+    def company_talks(
+        self, positions: np.ndarray | None = None, limit: int | None = NUM_TOP_COMPANIES
+    ) -> pd.Series:
+        selected = self.selection(positions)[self.company_positions]
+        counts = np.bincount(self.company_codes[selected], minlength=len(self.companies))
+        talks = pd.Series(counts, index=pd.Index(self.companies, name="company"), name="talks")
+        return talks[talks > 0].sort_values(ascending=False, kind="stable").head(limit)
+
+    def concurrent_sessions(self, positions: np.ndarray | None = None) -> pd.Series:
+        # number of talks running at the same time, a step function over time
+        selected = self.selection(positions)[self.step_positions]
+        times = self.step_times[selected]
+        counts = np.cumsum(self.step_deltas[selected])
+        # only the last step at a timestamp is the count from then on
+        last = np.r_[times[1:] != times[:-1], True] if len(times) else []
+        return pd.Series(
+            counts[last].astype(np.int64),
+            index=pd.to_datetime(times[last]).rename("time"),
+            name="concurrent talks",
+        )
@@ -0,0 +1,281 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Read-only HTTP/JSON API over the schedule for bots and other tools:
+#
+#   python api.py [--host 127.0.0.1] [--port 8000] [--offline]
+#
+#   GET /health
+#   GET /events?track=..&date=2024-06-25&room=..&company=..&edition=..&q=..&fields=title,room
+#   GET /events/<slug>
+#   GET /presenters?company=..&q=..
+#   GET /companies?company=..&q=..
+#
+# Filter parameters can be repeated and are combined like the app sidebar filters. Lists are
+# paginated with offset and limit.
+import argparse
+import datetime as dt
+import gzip
+import hashlib
+import json
+import logging
+import os
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from aiewf import AIEWF, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL, start_refresh_thread
+from editions import load_schedule
+from export_cache import ExportCache
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MIN_GZIP_BYTES = 1024
+API_CACHE_MB = int(os.getenv("AIEWF_API_CACHE_MB", 64))
+Query = tuple[tuple[str, tuple[str, ...]], ...]
+
+logger = logging.getLogger(__name__)
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def get_values(query: dict[str, list[str]], name: str) -> list[str]:
+    return [value for value in query.get(name, []) if value]
+
+
+def get_int(query: dict[str, list[str]], name: str, default: int, max_value: int) -> int:
+    values = get_values(query, name)
+    if not values:
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer") from None
+    if value < 0:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must not be negative")
+    return min(value, max_value)
+
+
+def get_dates(query: dict[str, list[str]]) -> list[dt.date]:
+    try:
+        return [dt.date.fromisoformat(value) for value in get_values(query, "date")]
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, "date must be formatted as YYYY-MM-DD") from None
+
+
+def project(df: pd.DataFrame, query: dict[str, list[str]]) -> pd.DataFrame:
+    fields = [f for value in get_values(query, "fields") for f in value.split(",") if f]
+    if not fields:
+        return df
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"Unknown fields: {', '.join(unknown)}")
+    return df[list(dict.fromkeys(fields))]
+
+
+def page(view: AIEWF, df: pd.DataFrame, positions: np.ndarray, query: dict[str, list[str]]) -> dict:
+    offset = get_int(query, "offset", 0, len(positions))
+    limit = get_int(query, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+    rows = project(df.iloc[positions[offset : offset + limit]], query)
+    return {
+        "data_version": view.data_version,
+        "total": len(positions),
+        "offset": offset,
+        "limit": limit,
+        "items": json.loads(rows.reset_index().to_json(orient="records", date_format="iso")),
+    }
+
+
+def match_text(df: pd.DataFrame, cols: list[str], text: str) -> np.ndarray:
+    mask = np.zeros(len(df), dtype=bool)
+    for col in cols:
+        mask |= df[col].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    return mask
+
+
+class ScheduleAPI:
+    def __init__(self, db: AIEWF, cache_bytes: int = API_CACHE_MB * 1024 * 1024):
+        self.db = db
+        self.cache = ExportCache(max_bytes=cache_bytes)
+        self.routes = {
+            "events": self.events,
+            "presenters": self.presenters,
+            "companies": self.companies,
+        }
+
+    @staticmethod
+    def etag(data_version: str, path: str, query: Query) -> str:
+        query_hash = hashlib.sha1(repr((path, query)).encode()).hexdigest()[:16]
+        return f'"{data_version}-{query_hash}"'
+
+    def respond(self, path: str, query: Query, gzipped: bool) -> tuple[str, bytes, bool]:
+        # Returns the ETag, the body and whether it is gzipped. Bodies are cached per data version
+        # and query, so a repeated request is only rendered and compressed once. The whole request
+        # reads one consistent view of the tables.
+        with_search = any(name == "q" for name, _ in query)
+        view = self.db.view(["search_index"] if with_search else [])
+        key = (view.data_version, path, query)
+        body = self.cache.get(key + (False,), lambda: self.render(view, path, query))
+        if gzipped and len(body) >= MIN_GZIP_BYTES:
+            body = self.cache.get(key + (True,), lambda: gzip.compress(body, compresslevel=6))
+        else:
+            gzipped = False
+        return self.etag(view.data_version, path, query), body, gzipped
+
+    def render(self, view: AIEWF, path: str, query: Query) -> bytes:
+        parts = path.strip("/").split("/", 1)
+        route = self.routes.get(parts[0])
+        if route is None:
+            raise APIError(HTTPStatus.NOT_FOUND, f"Unknown path: {path}")
+        payload = route(view, dict(query), unquote(parts[1]) if len(parts) > 1 else "")
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    def health(self) -> dict:
+        db = self.db
+        return {
+            "status": "ok",
+            "data_version": db.data_version,
+            "fetched_at": db.fetched_at,
+            "num_events": db.num_events,
+        }
+
+    def events(self, view: AIEWF, query: dict[str, list[str]], slug: str) -> dict:
+        search_query = " ".join(get_values(query, "q"))
+        event_df = view.event_df
+        if slug:
+            if slug not in event_df.index:
+                raise APIError(HTTPStatus.NOT_FOUND, f"Unknown event: {slug}")
+            row = project(event_df.loc[[slug]], query).reset_index()
+            return json.loads(row.to_json(orient="records", date_format="iso"))[0]
+
+        positions = view.filter_index.select(
+            edition=get_values(query, "edition"),
+            track=get_values(query, "track"),
+            date=get_dates(query),
+            room=get_values(query, "room"),
+            company=[company.strip() for company in get_values(query, "company")],
+        )
+        if search_query.strip():
+            # ordered by relevance instead of start time
+            search_positions, _ = view.search_index.search(search_query)
+            positions = search_positions[np.isin(search_positions, positions)]
+        return page(view, event_df, positions, query)
+
+    def presenters(self, view: AIEWF, query: dict[str, list[str]], item: str) -> dict:
+        presenter_table = view.presenter_table
+        mask = np.ones(len(presenter_table), dtype=bool)
+        companies = get_values(query, "company")
+        if companies:
+            mask &= presenter_table["company"].isin(companies).to_numpy()
+        for text in get_values(query, "q"):
+            mask &= match_text(presenter_table, ["name", "tagline", "about"], text)
+        return page(view, presenter_table, np.flatnonzero(mask), query)
+
+    def companies(self, view: AIEWF, query: dict[str, list[str]], item: str) -> dict:
+        company_table = view.company_table
+        mask = np.ones(len(company_table), dtype=bool)
+        companies = get_values(query, "company")
+        if companies:
+            mask &= company_table["name"].isin(companies).to_numpy()
+        for text in get_values(query, "q"):
+            mask &= match_text(company_table, ["name"], text)
+        return page(view, company_table, np.flatnonzero(mask), query)
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    # keep-alive, every response carries a Content-Length
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, Nagle would delay the body until the client ACKs
+    disable_nagle_algorithm = True
+    server: "APIServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") == "/health":
+            self.send_json(HTTPStatus.OK, self.server.api.health())
+            return
+        query: Query = tuple(sorted((k, tuple(v)) for k, v in parse_qs(url.query).items()))
+        api = self.server.api
+        # a matching ETag is answered without rendering anything
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        headers["ETag"] = api.etag(api.db.data_version, url.path, query)
+        if_none_match = self.headers.get("If-None-Match", "")
+        if headers["ETag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            self.send(HTTPStatus.NOT_MODIFIED, b"", headers)
+            return
+
+        try:
+            etag, body, gzipped = api.respond(
+                url.path, query, "gzip" in self.headers.get("Accept-Encoding", "")
+            )
+        except APIError as e:
+            self.send_json(e.status, {"error": str(e)})
+            return
+        except Exception:
+            logger.exception("Request %s failed", self.path)
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"})
+            return
+        headers["ETag"] = etag
+        headers["Content-Type"] = "application/json"
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+        self.send(HTTPStatus.OK, body, headers)
+
+    def send_json(self, status: HTTPStatus, payload: dict) -> None:
+        self.send(status, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+    def send(self, status: HTTPStatus, body: bytes, headers: dict[str, str]) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, message_format: str, *args) -> None:
+        logger.debug("%s - " + message_format, self.address_string(), *args)
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], api: ScheduleAPI):
+        super().__init__(address, APIRequestHandler)
+        self.api = api
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the schedule as a JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--sources", default=os.getenv("AIEWF_SOURCES", ""))
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-age", type=float, default=DEFAULT_CACHE_TTL)
+    parser.add_argument("--offline", action="store_true", help="only use the local snapshot")
+    parser.add_argument(
+        "--refresh-interval", type=float, default=float(os.getenv("AIEWF_REFRESH_INTERVAL", 0))
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    db = load_schedule(args.sources, args.cache_dir, args.max_age, args.offline)
+    if args.refresh_interval > 0 and not args.offline:
+        start_refresh_thread(db, args.refresh_interval)
+    server = APIServer((args.host, args.port), ScheduleAPI(db))
+    logger.info("Serving %d events on http://%s:%d", db.num_events, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
 import os
+import time
+import uuid
+from collections.abc import Callable, Iterable
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
@@ -10,12 +14,19 @@ from aiewf import (
     convert_dataframe_to_csv,
     convert_dataframe_to_excel,
     convert_df_dict_to_excel,
+    start_refresh_thread,
 )
+from editions import MergedSchedule, load_schedule
+from export_cache import ExportCache, hash_dataframe
+from favorites import FavoritesBackend, get_favorites_backend
+from profiling import Span, SpanRecord, profiler, span
 
 load_dotenv()
 
 pd.set_option("display.max_rows", None)
 pd.set_option("display.max_columns", None)
+# frames derived from the shared tables never write back into them
+pd.set_option("mode.copy_on_write", True)
 
 APP_TITLE = "AI Engineers World's Fair 2024 Schedule Browser"
 APP_DESC = """
@@ -44,42 +55,115 @@ The source code is on [GitHub](https://github.com/lolml-gmbh/aiewf2024_schedule_
 Like what you see? :sparkles: Let's meet at the fair :coffee: and talk about your ML project.
 """
 COL_FAV = "fav"
+LONG_TEXT_COLS = ["about", "tagline"]
+PAGE_SIZE = int(os.getenv("AIEWF_PAGE_SIZE", 50))
+PAGE_SIZES = sorted({25, 50, 100, 250, PAGE_SIZE})
+PREVIEW_CHARS = int(os.getenv("AIEWF_PREVIEW_CHARS", 120))
+SIMILAR_COLS = ["title", "trackName", "presenters", "room", "since", "link"]
+NUM_RECOMMENDATIONS = 10
 st.set_page_config(page_title=APP_TITLE, page_icon=":rocket:", layout="wide")
 
 
+REFRESH_INTERVAL = float(os.getenv("AIEWF_REFRESH_INTERVAL", 0))
+SCHEDULE_SOURCES = os.getenv("AIEWF_SOURCES", "")
+
+
 @st.cache_resource(show_spinner="Downloading data from ai.engineer ..")
 def get_db() -> AIEWF:
-    return AIEWF()
+    db = load_schedule(SCHEDULE_SOURCES)
+    if REFRESH_INTERVAL > 0:
+        start_refresh_thread(db, REFRESH_INTERVAL)
+    return db
+
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_CACHE_MB = int(os.getenv("AIEWF_EXPORT_CACHE_MB", 64))
+
+
+@st.cache_resource
+def get_export_cache() -> ExportCache:
+    return ExportCache(max_bytes=EXPORT_CACHE_MB * 1024 * 1024)
+
+
+def lazy_download_button(
+    container, label: str, key: tuple, render: Callable[[], bytes | str], **kwargs
+) -> None:
+    # The file is only encoded once somebody asks for it, and then shared by all sessions.
+    export_cache = get_export_cache()
+    if key not in export_cache and not container.button(f"Prepare {label.lower()}", key=str(key)):
+        return
+    container.download_button(label=label, data=export_cache.get(key, render), **kwargs)
 
 
-def display_df_download_buttons(df: pd.DataFrame, base_name: str, include_index: bool = False):
-    col1, col2, _, _ = st.columns(4)
+def display_df_download_buttons(
+    df: pd.DataFrame,
+    base_name: str,
+    include_index: bool = False,
+    render_ics: Callable[[], str] | None = None,
+):
+    col1, col2, col3, _ = st.columns(4)
+    df_hash = hash_dataframe(df)
     file_name = f"{base_name}.xlsx"
-    col1.download_button(
+    lazy_download_button(
+        col1,
         label="Download as Excel",
-        data=convert_dataframe_to_excel(df, include_index),
+        key=("xlsx", base_name, include_index, df_hash),
+        render=lambda: convert_dataframe_to_excel(df, include_index),
         file_name=file_name,
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        mime=EXCEL_MIME,
     )
     file_name = f"{base_name}.csv"
     col2.download_button(
         label="Download as CSV",
-        data=convert_dataframe_to_csv(df, include_index),
+        data=get_export_cache().get(
+            ("csv", base_name, include_index, df_hash),
+            lambda: convert_dataframe_to_csv(df, include_index),
+        ),
         file_name=file_name,
         mime="text/plain",
         key=file_name,
     )
+    if render_ics is not None:
+        file_name = f"{base_name}.ics"
+        col3.download_button(
+            label="Download as iCalendar",
+            data=get_export_cache().get(("ics", base_name, df_hash), render_ics),
+            file_name=file_name,
+            mime="text/calendar",
+            key=file_name,
+        )
 
 
 ENABLE_FAV_EVENTS = bool(int(os.getenv("ENABLE_FAV_EVENTS", 0)))
-FAV_EVENTS_FILE = "fav_events.txt"
+FAV_EVENTS_BACKEND = os.getenv("FAV_EVENTS_BACKEND", "sqlite")
+FAV_EVENTS_PATH = os.getenv(
+    "FAV_EVENTS_PATH", "fav_events.txt" if FAV_EVENTS_BACKEND == "file" else "fav_events.sqlite"
+)
+
+
+@st.cache_resource
+def get_fav_backend() -> FavoritesBackend:
+    return get_favorites_backend(FAV_EVENTS_BACKEND, FAV_EVENTS_PATH)
+
+
+def get_user_id() -> str:
+    # Favorites belong to the id in the `user` query parameter. A new visitor gets a fresh id, so
+    # reloading or bookmarking the page keeps the favorites.
+    user_id = st.query_params.get("user", "")
+    if not user_id:
+        user_id = uuid.uuid4().hex
+        st.query_params["user"] = user_id
+    return user_id
 
 
 class FavEvents:
-    def __init__(self):
-        self.event_ids: set[str] = set()
-        self.saved = False
-        self.load()
+    # Write-through cache of the favorite event slugs of one user, kept in st.session_state.
+    # Only the changes are written to the backend.
+
+    def __init__(self, backend: FavoritesBackend, user_id: str):
+        self.backend = backend
+        self.user_id = user_id
+        self.event_ids: set[str] = backend.load(user_id)
 
     def __contains__(self, item) -> bool:
         return item in self.event_ids
@@ -87,57 +171,235 @@ class FavEvents:
     def __iter__(self):
         return iter(self.event_ids)
 
-    def update(self, event_ids: set[str]) -> None:
-        event_ids = set(event_ids)
-        if event_ids != self.event_ids:
-            self.saved = False
-        self.event_ids = event_ids
-        if not self.saved:
-            self.save()
+    def __len__(self) -> int:
+        return len(self.event_ids)
+
+    def update(self, shown_ids: Iterable[str], fav_ids: Iterable[str]) -> None:
+        # Only the shown events can have been toggled, favorites hidden by a filter are kept.
+        fav_ids = set(fav_ids)
+        added = fav_ids - self.event_ids
+        removed = (set(shown_ids) - fav_ids) & self.event_ids
+        if added or removed:
+            self.backend.apply(self.user_id, added, removed)
+            self.event_ids = (self.event_ids | added) - removed
 
     def add(self, event_id: str) -> None:
-        self.event_ids.add(event_id)
-        self.saved = True
+        self.update([event_id], [event_id])
 
     def remove(self, event_id: str) -> None:
-        self.event_ids.remove(event_id)
-        self.saved = True
+        self.update([event_id], [])
+
+
+class RenderStats:
+    # Rows and Arrow bytes of the tables sent to the browser in one rerun, and the script time
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.num_rows = 0
+        self.payload_bytes = 0
+
+    def add(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        self.num_rows += len(df)
+        self.payload_bytes += pa.Table.from_pandas(df, preserve_index=False).nbytes
+
+    def display(self) -> None:
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        st.sidebar.caption(
+            f"This rerun sent {self.num_rows} table rows ({self.payload_bytes / 1024:.1f} KB) "
+            f"and took {duration_ms:.0f} ms"
+        )
+
+
+def paginate(num_rows: int, key: str) -> slice:
+    # Only one page of a table is sent to the browser. The page is clamped when a filter
+    # shrinks the table.
+    col1, col2, col3 = st.columns([1, 1, 4], vertical_alignment="bottom")
+    page_size = col1.selectbox(
+        "Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE), key=f"{key}_page_size"
+    )
+    num_pages = max(1, -(-num_rows // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > num_pages:
+        st.session_state[page_key] = num_pages
+    page = col2.number_input(f"Page (of {num_pages})", 1, num_pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, num_rows)
+    col3.caption(f"Rows {start + 1}-{stop} of {num_rows}")
+    return slice(start, stop)
+
+
+def truncate_text(df: pd.DataFrame, max_chars: int = PREVIEW_CHARS) -> pd.DataFrame:
+    # long texts are cut for the table, the full text is shown in the detail pane
+    for col in LONG_TEXT_COLS:
+        if col not in df.columns:
+            continue
+        text = df[col]
+        is_long = text.str.len().fillna(0).to_numpy() > max_chars
+        if is_long.any():
+            df[col] = text.where(~is_long, text.str.slice(0, max_chars - 1) + "…")
+    return df
+
+
+def display_table(
+    df: pd.DataFrame, key: str, column_config: dict, render_stats: RenderStats
+) -> None:
+    with span(f"render {key}"):
+        page_df = truncate_text(df.iloc[paginate(len(df), key)])
+        render_stats.add(page_df)
+        st.dataframe(
+            page_df, hide_index=True, use_container_width=True, column_config=column_config
+        )
 
-    def save(self) -> None:
-        if self.saved:
+
+def display_event_details(db: AIEWF, event_df: pd.DataFrame) -> None:
+    with st.expander("Event details"):
+        titles = event_df["title"]
+        slug = st.selectbox(
+            "Event", event_df.index, format_func=lambda s: titles[s], key="event_details"
+        )
+        if slug is None:
             return
-        with open(FAV_EVENTS_FILE, "w") as f:
-            f.write("\n".join(sorted(self.event_ids)))
+        event = event_df.loc[slug]
+        st.subheader(event["title"])
+        when = f"{event['since']:%a %d %b, %H:%M}" if pd.notna(event["since"]) else "Time unknown"
+        st.caption(f"{when} · {event['room']} · {event['trackName']}")
+        if pd.notna(event["presenters"]) and event["presenters"]:
+            st.markdown(f"**Presenters:** {event['presenters']}")
+        if pd.notna(event["about"]) and event["about"]:
+            st.markdown(event["about"])
+        if pd.notna(event["link"]) and event["link"]:
+            st.markdown(f"[Event page]({event['link']})")
+        similar_df = db.similar(slug)
+        if not similar_df.empty:
+            st.markdown("**Similar talks**")
+            st.dataframe(
+                similar_df[SIMILAR_COLS],
+                hide_index=True,
+                use_container_width=True,
+                column_config={"link": st.column_config.LinkColumn("link")},
+            )
+
+
+def display_recommendations(db: AIEWF, fav_positions: np.ndarray) -> None:
+    if len(fav_positions) == 0:
+        return
+    recommended_df = db.recommend(fav_positions, limit=NUM_RECOMMENDATIONS)
+    if recommended_df.empty:
+        return
+    st.subheader("You might also like")
+    st.caption("Talks similar to your favorite events")
+    st.dataframe(
+        recommended_df[SIMILAR_COLS],
+        hide_index=True,
+        use_container_width=True,
+        column_config={"link": st.column_config.LinkColumn("link")},
+    )
+
 
-    def load(self) -> None:
-        try:
-            with open(FAV_EVENTS_FILE) as f:
-                self.event_ids = set(f.read().splitlines())
-        except FileNotFoundError:
-            pass
+def display_charts(db: AIEWF, event_positions: np.ndarray) -> None:
+    # the aggregates are cached per data version, a rerun only sums the selected events
+    import altair as alt
+
+    analytics = db.analytics
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Concurrent talks", "Track load", "Room occupancy", "Talks per company"]
+    )
+    tab1.line_chart(analytics.concurrent_sessions(event_positions))
+    track_load = analytics.track_load(event_positions)
+    track_load.index = track_load.index.astype(str)
+    tab2.bar_chart(track_load, y_label="hours")
+    occupancy = analytics.room_occupancy(event_positions)
+    occupancy = occupancy.stack().rename("occupancy").reset_index()
+    tab3.altair_chart(
+        alt.Chart(occupancy)
+        .mark_rect()
+        .encode(
+            x=alt.X("time:T", title=None),
+            y=alt.Y("room:N", title=None),
+            color=alt.Color("occupancy:Q", scale=alt.Scale(scheme="blues")),
+            tooltip=["time:T", "room:N", alt.Tooltip("occupancy:Q", format=".0%")],
+        ),
+        use_container_width=True,
+    )
+    tab4.bar_chart(analytics.company_talks(event_positions), y_label="talks")
+
+
+def span_table(records: list[SpanRecord]) -> pd.DataFrame:
+    rows = [
+        {
+            "span": "  " * record.depth + record.name,
+            "ms": record.seconds * 1000,
+            "memory KB": None if record.memory_delta is None else record.memory_delta / 1024,
+        }
+        for root in records
+        for record in root.walk()
+    ]
+    return pd.DataFrame(rows)
+
+
+def display_profile(rerun_span: Span) -> None:
+    # debug panel of the spans of this rerun and of the latest schedule loads and refreshes
+    with st.sidebar.expander("Profiling"):
+        st.caption("This rerun")
+        st.dataframe(span_table([rerun_span.record]), hide_index=True)
+        # the first load runs inside the rerun of the first session
+        loads = [
+            record
+            for root in profiler.recent()
+            for record in root.walk()
+            if record.name in ("load", "refresh")
+        ][-5:]
+        if loads:
+            st.caption("Schedule loads")
+            st.dataframe(span_table(loads), hide_index=True)
+
+
+def display_fav_conflicts(db: AIEWF, fav_positions: np.ndarray) -> None:
+    fav_conflicts = db.find_conflicts(fav_positions)
+    if fav_conflicts.empty:
+        return
+    st.warning(f"{len(fav_conflicts)} pairs of your favorite events overlap in time")
+    st.dataframe(
+        fav_conflicts.drop(columns=["slug_1", "slug_2"]),
+        hide_index=True,
+        use_container_width=True,
+    )
 
 
 def main() -> None:
+    render_stats = RenderStats()
     st.title(APP_TITLE)
     st.logo("lolml.png", link="https://lolml.com/")
     st.markdown(APP_DESC)
 
-    db = get_db()
-    if st.session_state.get("event_df", None) is None:
-        st.session_state.event_df = db.event_df.copy()
-        event_df = st.session_state.event_df
-        if ENABLE_FAV_EVENTS:
-            event_df.insert(loc=0, column="fav", value=False)
-            event_df[COL_FAV] = False
-            st.session_state.fav_events = FavEvents()
-            fav_events = st.session_state.fav_events
-            event_df.loc[event_df["title"].isin(fav_events), COL_FAV] = True
-
-    event_df = st.session_state.event_df
+    # All sessions share the read-only tables of the schedule, a session only keeps a boolean mask
+    # of its favorite events per data version. The whole rerun works on one view of the tables, a
+    # background refresh only takes effect with the next rerun.
+    derived = ["search_index", "similar_events", "vevents"]
+    if st.session_state.get("show_charts"):
+        derived.append("analytics")
+    db = get_db().view(derived)
+    event_df = db.event_df
+    data_version = db.data_version
+    if ENABLE_FAV_EVENTS:
+        if "fav_events" not in st.session_state:
+            st.session_state.fav_events = FavEvents(get_fav_backend(), get_user_id())
+        if st.session_state.get("data_version", None) != data_version:
+            st.session_state.data_version = data_version
+            st.session_state.fav_mask = event_df.index.isin(st.session_state.fav_events.event_ids)
+        fav_mask = st.session_state.fav_mask
+
+    if isinstance(db, MergedSchedule):
+        selected_editions = st.sidebar.multiselect("Edition", list(db.editions))
+    else:
+        selected_editions = []
     selected_tracks = st.sidebar.multiselect("Track", db.tracks)
     selected_dates = st.sidebar.multiselect("Date", db.dates)
     selected_rooms = st.sidebar.multiselect("Room", db.event_rooms)
     selected_companies = st.sidebar.multiselect("Company", db.companies)
+    search_query = st.sidebar.text_input("Search", placeholder="Titles, abstracts, speaker bios")
     st.sidebar.caption(
         "Empty filter will select all available data. Multiple selections are supported."
     )
@@ -152,26 +414,40 @@ def main() -> None:
     presenter_df = db.presenter_df
     company_df = db.company_df
     event_base_name = "event_df"
+    event_positions = db.filter_events(
+        tracks=selected_tracks,
+        dates=selected_dates,
+        rooms=selected_rooms,
+        companies=selected_companies,
+        editions=selected_editions,
+    )
+    if search_query.strip():
+        with span("search"):
+            search_positions, _ = db.search_index.search(search_query)
+        event_positions = search_positions[np.isin(search_positions, event_positions)]
+        event_base_name += "_search"
+    if ENABLE_FAV_EVENTS and show_fav_only:
+        event_positions = event_positions[fav_mask[event_positions]]
+    event_df = event_df.iloc[event_positions]
+    if selected_editions:
+        event_base_name += f"_editions_{'-'.join(selected_editions)}"
     if selected_tracks:
-        event_df = event_df[event_df["trackName"].isin(selected_tracks)]
         selected_tracks_str = "-".join(selected_tracks)
         event_base_name += f"_tracks_{selected_tracks_str}"
     if selected_dates:
-        event_df = event_df[event_df["date"].isin(selected_dates)]
         selected_dates_str = "-".join([f"{d:%d}" for d in selected_dates])
         event_base_name += f"_dates_{selected_dates_str}"
     if selected_rooms:
-        event_df = event_df[event_df["room"].isin(selected_rooms)]
         selected_rooms_str = "-".join(selected_rooms)
         event_base_name += f"_rooms_{selected_rooms_str}"
     if selected_companies:
-        event_df = event_df[event_df["company"].isin(selected_companies)]
         presenter_df = presenter_df[presenter_df["company"].isin(selected_companies)]
         company_df = company_df[company_df["name"].isin(selected_companies)]
         selected_companies_str = "-".join(selected_companies)
         event_base_name += f"_companies_{selected_companies_str}"
-    if ENABLE_FAV_EVENTS and show_fav_only:
-        event_df = event_df[event_df[COL_FAV]]
+
+    def render_ics() -> str:
+        return "".join(db.iter_ics(event_positions, name=APP_TITLE))
 
     column_config = {
         "link": st.column_config.LinkColumn("link"),
@@ -180,59 +456,82 @@ def main() -> None:
     if event_df.empty:
         st.warning("No data found with the selected filters")
     else:
+        shown_cols = st.multiselect(
+            "Columns", list(event_df.columns), default=list(event_df.columns), key="event_columns"
+        )
+        with span("render events"):
+            page = paginate(len(event_df), "events")
+            page_df = event_df.iloc[page]
+            shown_df = truncate_text(page_df[shown_cols])
+            if ENABLE_FAV_EVENTS:
+                page_positions = event_positions[page]
+                shown_df.insert(loc=0, column=COL_FAV, value=fav_mask[page_positions])
+                render_stats.add(shown_df)
+                edited_df = st.data_editor(
+                    shown_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config=column_config,
+                    disabled=shown_cols,
+                )
+                fav_events = st.session_state.fav_events
+                fav_events.update(edited_df.index, edited_df.index[edited_df[COL_FAV]])
+                fav_mask[page_positions] = edited_df[COL_FAV].to_numpy()
+                event_df.insert(loc=0, column=COL_FAV, value=fav_mask[event_positions])
+            else:
+                render_stats.add(shown_df)
+                st.dataframe(
+                    shown_df, hide_index=True, use_container_width=True, column_config=column_config
+                )
+        display_event_details(db, page_df)
+        with span("downloads"):
+            display_df_download_buttons(event_df, event_base_name, render_ics=render_ics)
         if ENABLE_FAV_EVENTS:
-            non_editable_cols = list(event_df.columns)
-            non_editable_cols.remove(COL_FAV)
-            edited_event_df = st.data_editor(
-                event_df,
-                hide_index=True,
-                use_container_width=True,
-                column_config=column_config,
-                disabled=non_editable_cols,
-            )
-            display_df_download_buttons(edited_event_df, event_base_name)
-            fav_events = st.session_state.fav_events
-            fav_event_titles = edited_event_df[edited_event_df[COL_FAV]]["title"].tolist()
-            fav_events.update(fav_event_titles)
-            event_df = st.session_state.event_df
-            event_df.loc[:, COL_FAV] = False
-            event_df.loc[event_df["title"].isin(fav_event_titles), COL_FAV] = True
+            with span("conflicts"):
+                display_fav_conflicts(db, np.flatnonzero(fav_mask))
+            with span("recommend"):
+                display_recommendations(db, np.flatnonzero(fav_mask))
+
+    st.header("Analytics")
+    if st.toggle("Show charts of the selected events", key="show_charts"):
+        if len(event_positions) == 0:
+            st.warning("No data found with the selected filters")
         else:
-            st.dataframe(
-                event_df, hide_index=True, use_container_width=True, column_config=column_config
-            )
-            display_df_download_buttons(event_df, event_base_name)
+            with span("charts"):
+                display_charts(db, event_positions)
 
     if bool(int(os.getenv("SHOW_PRESENTERS", False))):
         st.header("Presenters")
         if presenter_df.empty:
             st.warning("No data found with the selected filters")
         else:
-            st.dataframe(
-                presenter_df, hide_index=True, use_container_width=True, column_config=column_config
-            )
+            display_table(presenter_df, "presenters", column_config, render_stats)
 
     st.header("Companies")
     if company_df.empty:
         st.warning("No data found with the selected filters")
     else:
-        st.dataframe(
-            company_df, hide_index=True, use_container_width=True, column_config=column_config
-        )
+        display_table(company_df, "companies", column_config, render_stats)
 
     df_dict = {"events": db.event_df, "presenters": db.presenter_df, "companies": db.company_df}
     now_str = pd.Timestamp.now().strftime("%Y-%m-%d-%H-%M-%S")
-    st.download_button(
+    lazy_download_button(
+        st,
         label="Download all data as Excel",
-        data=convert_df_dict_to_excel(df_dict),
+        key=("xlsx", "all", db.data_version),
+        render=lambda: convert_df_dict_to_excel(df_dict),
         file_name=f"{now_str}-aiewf_export.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        mime=EXCEL_MIME,
     )
     st.caption("(Filters are not applied)")
 
     st.markdown(COPYRIGHT_LINE)
     st.caption(LEGAL_NOTICE)
+    render_stats.display()
 
 
 if __name__ == "__main__":
-    main()
+    with span("rerun") as rerun_span:
+        main()
+    if profiler.enabled:
+        display_profile(rerun_span)
@@ -0,0 +1,109 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Load test of the JSON API on a local synthetic schedule: requests per second with a cold and a
+# warm response cache, and for ETag revalidations answered with 304.
+#
+#   python -m benchmarks.bench_api [--events 5000] [--clients 8] [--requests 2000]
+import argparse
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiewf import AIEWF
+from api import APIServer, ScheduleAPI
+from benchmarks.synthetic import fixture_session, make_events, make_schedule_html
+
+
+def make_paths(db: AIEWF) -> list[str]:
+    paths = ["/events", "/events?limit=200&fields=title,room,since", "/presenters", "/companies"]
+    paths += [f"/events?track={track}" for track in db.tracks]
+    paths += [f"/events?room={room}&limit=20" for room in db.event_rooms]
+    paths += [f"/events?date={date}&offset=50" for date in db.dates]
+    paths += [f"/events?q={word}" for word in ("agents", "retrieval", "gpu serving", "vec")]
+    paths += [f"/events/{slug}" for slug in db.event_df.index[:20]]
+    return [path.replace(" ", "%20") for path in paths]
+
+
+def run_client(
+    port: int, paths: list[str], num_requests: int, etags: dict[str, str] | None
+) -> tuple[int, dict[int, int]]:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    statuses: dict[int, int] = {}
+    num_bytes = 0
+    for i in range(num_requests):
+        path = paths[i % len(paths)]
+        headers = {"Accept-Encoding": "gzip"}
+        if etags is not None:
+            headers["If-None-Match"] = etags[path]
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        num_bytes += len(response.read())
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+    conn.close()
+    return num_bytes, statuses
+
+
+def load_test(
+    port: int,
+    paths: list[str],
+    num_clients: int,
+    num_requests: int,
+    etags: dict[str, str] | None = None,
+) -> tuple[float, int, dict[int, int]]:
+    per_client = num_requests // num_clients
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_clients) as executor:
+        results = list(
+            executor.map(
+                lambda k: run_client(port, paths[k:] + paths[:k], per_client, etags),
+                range(num_clients),
+            )
+        )
+    seconds = time.perf_counter() - start
+    statuses: dict[int, int] = {}
+    for _, client_statuses in results:
+        for status, count in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return per_client * num_clients / seconds, sum(r[0] for r in results), statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2_000)
+    args = parser.parse_args()
+
+    session = fixture_session(make_schedule_html(make_events(args.events)))
+    db = AIEWF(cache_dir=None, session=session)
+    api = ScheduleAPI(db)
+    server = APIServer(("127.0.0.1", 0), api)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    paths = make_paths(db)
+
+    try:
+        rps, num_bytes, statuses = load_test(port, paths, 1, len(paths))
+        print(f"cold cache : {rps:8.0f} req/s  {statuses}  ({len(paths)} distinct queries)")
+        rps, num_bytes, statuses = load_test(port, paths, args.clients, args.requests)
+        print(
+            f"warm cache : {rps:8.0f} req/s  {statuses}  "
+            f"({num_bytes / args.requests / 1024:.1f} KB per gzipped response)"
+        )
+        etags = {}
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for path in paths:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            etags[path] = response.getheader("ETag")
+        conn.close()
+        rps, _, statuses = load_test(port, paths, args.clients, args.requests, etags)
+        print(f"revalidate : {rps:8.0f} req/s  {statuses}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
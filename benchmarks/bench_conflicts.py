@@ -0,0 +1,65 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Times the sweep-line overlap detection, room double-booking check and itinerary builder on
+# synthetic intervals, and checks the sweep against the quadratic pairwise comparison.
+#
+#   python -m benchmarks.bench_conflicts [--sizes 50000 100000 200000]
+import argparse
+import time
+
+import numpy as np
+
+from conflicts import max_itinerary, overlapping_pairs
+
+MINUTE = 60 * 10**9
+
+
+def make_intervals(n: int, num_rooms: int, seed: int = 0):
+    # a three day conference, talks of 15-60 minutes between 8:00 and 18:00
+    rng = np.random.default_rng(seed)
+    day = rng.integers(0, 3, n)
+    start_minute = 8 * 60 + 15 * rng.integers(0, 40, n)
+    starts = (day * 24 * 60 + start_minute) * MINUTE
+    ends = starts + 15 * rng.integers(1, 5, n) * MINUTE
+    rooms = rng.integers(0, num_rooms, n)
+    return starts, ends, rooms
+
+
+def brute_force_pairs(starts: np.ndarray, ends: np.ndarray) -> set[tuple[int, int]]:
+    overlaps = (starts[:, None] < ends[None, :]) & (starts[None, :] < ends[:, None])
+    i, j = np.nonzero(np.triu(overlaps, k=1))
+    return set(zip(i.tolist(), j.tolist(), strict=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 100_000, 200_000])
+    args = parser.parse_args()
+
+    starts, ends, _ = make_intervals(2000, num_rooms=50)
+    pairs = {tuple(sorted(p)) for p in overlapping_pairs(starts, ends).tolist()}
+    assert pairs == brute_force_pairs(starts, ends)
+
+    for n in args.sizes:
+        # rooms scale with the schedule, so that a room holds a few hundred talks
+        starts, ends, rooms = make_intervals(n, num_rooms=max(1, n // 200))
+        timings = {}
+        start = time.perf_counter()
+        room_pairs = overlapping_pairs(starts, ends, rooms)
+        timings["room double-bookings"] = time.perf_counter() - start
+        start = time.perf_counter()
+        itinerary = max_itinerary(starts, ends)
+        timings["itinerary"] = time.perf_counter() - start
+        favorites = np.sort(np.random.default_rng(1).choice(n, size=min(n, 500), replace=False))
+        start = time.perf_counter()
+        fav_pairs = overlapping_pairs(starts[favorites], ends[favorites])
+        timings["500 favorites"] = time.perf_counter() - start
+        summary = ", ".join(f"{name} {sec * 1000:.1f} ms" for name, sec in timings.items())
+        print(
+            f"{n:>7} intervals: {summary} "
+            f"({len(room_pairs)} double-bookings, {len(itinerary)} in itinerary, "
+            f"{len(fav_pairs)} favorite conflicts)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Compares the streaming Excel writer with the original pd.ExcelWriter based export on a
+# synthetic schedule, in time and in the peak memory allocated while writing. Every writer runs
+# in a fresh interpreter, and the written workbooks are read back and compared.
+#
+#   python -m benchmarks.bench_excel [--events 20000] [--no-widths]
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from aiewf import AIEWF
+from benchmarks.synthetic import fixture_session, make_events, make_schedule_html
+from excel import clean_excel_sheet_name, write_excel
+
+
+def convert_df_dict_to_excel_reference(
+    dfs: dict[str, pd.DataFrame], adjust_col_width: bool = False
+) -> bytes:
+    # the in-memory export used before the streaming writer, kept as a reference
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for i, (sheet_name, df) in enumerate(dfs.items()):
+            sheet_name = clean_excel_sheet_name(sheet_name, i)
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            if not adjust_col_width:
+                continue
+            worksheet = writer.sheets[sheet_name]
+            for col_index, col in enumerate(df):
+                max_len = max(df[col].astype(str).map(len).max(), len(str(df[col].name))) + 1
+                worksheet.set_column(col_index, col_index, max_len)
+    return buffer.getvalue()
+
+
+def load_tables(num_events: int) -> dict[str, pd.DataFrame]:
+    session = fixture_session(make_schedule_html(make_events(num_events)))
+    db = AIEWF(cache_dir=None, session=session)
+    return {"events": db.event_df, "presenters": db.presenter_df, "companies": db.company_df}
+
+
+def write(writer: str, dfs: dict[str, pd.DataFrame], output_path: str, adjust_col_width: bool):
+    if writer == "reference":
+        data = convert_df_dict_to_excel_reference(dfs, adjust_col_width)
+        with open(output_path, "wb") as f:
+            f.write(data)
+    else:
+        with open(output_path, "wb") as f:
+            write_excel(dfs, f, adjust_col_width=adjust_col_width)
+
+
+def run_writer(writer: str, num_events: int, output_path: str, adjust_col_width: bool) -> dict:
+    dfs = load_tables(num_events)
+    start = time.perf_counter()
+    write(writer, dfs, output_path, adjust_col_width)
+    duration = time.perf_counter() - start
+    # a second, slower run traces the memory allocated while writing
+    tracemalloc.start()
+    write(writer, dfs, output_path, adjust_col_width)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": duration,
+        "peak_mb": peak_bytes / 2**20,
+        "file_mb": os.path.getsize(output_path) / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--no-widths", action="store_true", help="skip column autosizing")
+    parser.add_argument("--run", choices=["reference", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    adjust_col_width = not args.no_widths
+
+    if args.run:
+        print(json.dumps(run_writer(args.run, args.events, args.output, adjust_col_width)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = {}
+        for writer in ("reference", "streaming"):
+            paths[writer] = os.path.join(tmp_dir, f"{writer}.xlsx")
+            command = [sys.executable, "-m", "benchmarks.bench_excel", "--run", writer]
+            command += ["--events", str(args.events), "--output", paths[writer]]
+            if args.no_widths:
+                command.append("--no-widths")
+            output = subprocess.run(command, capture_output=True, check=True)
+            result = json.loads(output.stdout)
+            print(
+                f"{writer:>9}: {result['seconds']:6.2f} s, "
+                f"peak memory while writing {result['peak_mb']:6.1f} MB, "
+                f"file {result['file_mb']:.1f} MB"
+            )
+
+        reference = pd.read_excel(paths["reference"], sheet_name=None)
+        streaming = pd.read_excel(paths["streaming"], sheet_name=None)
+        assert list(reference) == list(streaming)
+        for sheet_name, df in reference.items():
+            pd.testing.assert_frame_equal(df, streaming[sheet_name], check_dtype=False)
+        print("both workbooks hold the same data")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Compares the byte-scanning __NEXT_DATA__ extractor with the BeautifulSoup path, both decode the
+# events with json.loads. Every measurement runs in a fresh interpreter so that peak RSS is
+# attributed to one path only.
+# The Python heap peak is measured with tracemalloc in a second, untimed run.
+#
+#   python -m benchmarks.bench_extract [--html saved_page.html] [--events 5000]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_events, make_schedule_html
+
+PATHS = ["scan", "bs4"]
+
+
+def extract(html: bytes, path: str) -> list[dict]:
+    from extract import extract_events
+
+    return extract_events(html, use_bs4=path == "bs4")[0]
+
+
+def run_path(html_path: str, path: str) -> dict:
+    with open(html_path, "rb") as f:
+        html = f.read()
+    start = time.perf_counter()
+    events = extract(html, path)
+    duration = time.perf_counter() - start
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    num_events = len(events)
+    del events
+    tracemalloc.start()
+    extract(html, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "events": num_events,
+        "seconds": duration,
+        "max_rss_mb": max_rss_kb / 1024,
+        "heap_peak_mb": peak / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--html", help="saved schedule page, a synthetic page is used if omitted")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--run", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_path(args.html, args.run)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        html_path = args.html or os.path.join(tmp_dir, "schedule.html")
+        if not args.html:
+            with open(html_path, "w") as f:
+                f.write(make_schedule_html(make_events(args.events), padding=args.events))
+        for path in PATHS:
+            results = []
+            for _ in range(args.repeat):
+                command = [sys.executable, "-m", "benchmarks.bench_extract", "--html", html_path]
+                output = subprocess.run(command + ["--run", path], capture_output=True, check=True)
+                results.append(json.loads(output.stdout))
+            best = min(results, key=lambda r: r["seconds"])
+            print(
+                f"{path:>6}: {best['events']} events, {best['seconds'] * 1000:.1f} ms, "
+                f"peak RSS {best['max_rss_mb']:.1f} MB, heap peak {best['heap_peak_mb']:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
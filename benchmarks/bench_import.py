@@ -0,0 +1,69 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Startup time of the app modules: every measurement runs in a fresh interpreter and times the
+# imports of the app, and the import plus the load of a prewarmed schedule snapshot. It also
+# lists which of the heavy optional dependencies got imported on the way.
+#
+#   python -m benchmarks.bench_import [--repeat 5] [--cache-dir aiewf_cache]
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import prewarm
+from aiewf import AIEWF
+from benchmarks.synthetic import fixture_session, load_fixture, make_page
+
+HEAVY_MODULES = ["requests", "bs4", "lxml", "xlsxwriter", "openpyxl", "scipy", "altair"]
+STAGES = {
+    "import aiewf": "import aiewf",
+    "import app modules": "import aiewf, editions, export_cache, favorites, profiling",
+    "import streamlit": "import streamlit",
+    "load snapshot": (
+        "from editions import load_schedule\n"
+        "from prewarm import prewarm\n"
+        "prewarm(load_schedule('', CACHE_DIR, offline=True))"
+    ),
+}
+
+
+def measure(code: str, cache_dir: str) -> dict:
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"CACHE_DIR = {cache_dir!r}\n"
+        f"{code}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'seconds': seconds, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True)
+    return json.loads(output.stdout)
+
+
+def write_snapshot(cache_dir: str) -> None:
+    # a snapshot with all derived structures, as prewarm.py writes it
+    db = AIEWF(cache_dir=cache_dir, max_age=0, session=fixture_session(make_page(load_fixture())))
+    prewarm.prewarm(db)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cache-dir", help="default: a snapshot of the benchmark fixture")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = args.cache_dir or tmp_dir
+        if not args.cache_dir:
+            write_snapshot(cache_dir)
+        for stage, code in STAGES.items():
+            results = [measure(code, cache_dir) for _ in range(args.repeat)]
+            seconds = statistics.median(result["seconds"] for result in results)
+            heavy = ", ".join(results[0]["heavy"]) or "-"
+            print(f"{stage:20} {seconds * 1000:8.1f} ms   heavy modules: {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Simulates N app sessions and compares the memory they retain: a private event_df copy with a
+# fav column per session (the old app) against a favorites mask over the shared event_df.
+#
+#   python -m benchmarks.bench_sessions [--events 5000] [--sessions 10 100 500]
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from aiewf import AIEWF
+from benchmarks.synthetic import make_events
+from normalize import normalize_events
+
+NUM_FAVORITES = 20
+
+
+def copy_sessions(event_df, favorites: list[set[str]]) -> list[dict]:
+    sessions = []
+    for fav_ids in favorites:
+        session_df = event_df.copy()
+        session_df.insert(loc=0, column="fav", value=session_df.index.isin(fav_ids))
+        sessions.append({"event_df": session_df})
+    return sessions
+
+
+def mask_sessions(event_df, favorites: list[set[str]]) -> list[dict]:
+    return [{"fav_mask": event_df.index.isin(fav_ids)} for fav_ids in favorites]
+
+
+def retained_bytes(simulate, event_df, favorites: list[set[str]]) -> tuple[int, list[dict]]:
+    gc.collect()
+    tracemalloc.start()
+    sessions = simulate(event_df, favorites)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, sessions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    keyed_events = AIEWF.key_events(make_events(args.events))
+    event_df = normalize_events(keyed_events, AIEWF.event_base_url).event_df
+    shared_mb = event_df.memory_usage(deep=True).sum() / 2**20
+    print(f"{args.events} events, shared event_df {shared_mb:.1f} MB")
+
+    rng = np.random.default_rng(0)
+    slugs = event_df.index.to_numpy()
+    for num_sessions in args.sessions:
+        favorites = [
+            set(rng.choice(slugs, size=NUM_FAVORITES, replace=False)) for _ in range(num_sessions)
+        ]
+        copy_size, copies = retained_bytes(copy_sessions, event_df, favorites)
+        del copies
+        mask_size, masks = retained_bytes(mask_sessions, event_df, favorites)
+        for session, fav_ids in zip(masks, favorites, strict=True):
+            assert set(slugs[session["fav_mask"]]) == fav_ids
+        del masks
+        print(
+            f"{num_sessions:>5} sessions: copies {copy_size / 2**20:8.1f} MB, "
+            f"masks {mask_size / 2**20:6.2f} MB, {copy_size / max(mask_size, 1):.0f}x less"
+        )
+
+
+if __name__ == "__main__":
+    main()
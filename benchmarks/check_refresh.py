@@ -0,0 +1,132 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Regression check of the incremental refresh: after events are added, removed or modified, the
+# refreshed tables have to equal the tables of a fresh load of the same page, and a failed update
+# has to be retried by the next refresh. Runs offline on the benchmark fixture and exits with 1 if
+# a case fails.
+#
+#   python -m benchmarks.check_refresh
+import copy
+import sys
+from collections.abc import Callable
+from functools import partial
+
+import pandas as pd
+
+from aiewf import AIEWF
+from benchmarks.synthetic import fixture_session, load_fixture, make_events, make_page
+
+
+def consistent_presenters(events: list[dict]) -> None:
+    # On the real page a presenter has the same attributes in all of their events. The synthetic
+    # fixture draws them per event, so the refresh and a fresh load would keep different copies.
+    attributes = {}
+    for event in events:
+        for presenter in event["presenters"]:
+            presenter["attributes"] = attributes.setdefault(
+                presenter["id"], presenter["attributes"]
+            )
+
+
+def add_event(events: list[dict]) -> None:
+    new_event = make_events(1, seed=1)[0]
+    new_event["slug"] = "talk-added"
+    new_event["since"] = events[0]["since"]  # starts at the same time as an existing event
+    events.append(new_event)
+
+
+def remove_event(events: list[dict]) -> None:
+    # a cancelled talk
+    del events[len(events) // 2]
+
+
+def modify_event(events: list[dict]) -> None:
+    events[0]["title"] += " (updated)"
+    events[1]["room"] = "Salon 2"
+    events[2]["presenters"] = events[2]["presenters"][:-1]
+
+
+MAX_ERROR_CHARS = 1000
+CASES: dict[str, list[Callable[[list[dict]], None]]] = {
+    "add only": [add_event],
+    "remove only": [remove_event],
+    "modify only": [modify_event],
+    "all changes": [add_event, remove_event, modify_event],
+}
+
+
+def check_case(next_data: dict, changes: list[Callable[[list[dict]], None]]) -> list[str]:
+    next_data = copy.deepcopy(next_data)
+    consistent_presenters(next_data["props"]["pageProps"]["schedule"]["events"])
+    session = fixture_session(make_page(next_data))
+    db = AIEWF(cache_dir=None, session=session)
+    next_data = copy.deepcopy(next_data)
+    for change in changes:
+        change(next_data["props"]["pageProps"]["schedule"]["events"])
+    html = make_page(next_data)
+    session.get_adapter("https://").content = html.encode()
+    db.refresh()
+    fresh = AIEWF(cache_dir=None, session=fixture_session(html))
+
+    errors = []
+    try:
+        pd.testing.assert_frame_equal(db.event_df, fresh.event_df)
+    except AssertionError as e:
+        errors.append(f"event_df: {e}")
+    for table in ["presenter_table", "company_table"]:
+        try:
+            pd.testing.assert_frame_equal(
+                getattr(db, table).sort_index(), getattr(fresh, table).sort_index()
+            )
+        except AssertionError as e:
+            errors.append(f"{table}: {e}")
+    presenters = db.event_presenters.sort_values(["slug", "presenter_id"], ignore_index=True)
+    fresh_presenters = fresh.event_presenters.sort_values(
+        ["slug", "presenter_id"], ignore_index=True
+    )
+    try:
+        pd.testing.assert_frame_equal(presenters, fresh_presenters)
+    except AssertionError as e:
+        errors.append(f"event_presenters: {e}")
+    return errors
+
+
+def check_failed_update(next_data: dict) -> list[str]:
+    # An update that fails halfway must be retried by the next refresh, and not be skipped
+    # because the server answers the ETag of the failed update with 304.
+    session = fixture_session(make_page(next_data), etag="v1")
+    db = AIEWF(cache_dir=None, session=session)
+    next_data = copy.deepcopy(next_data)
+    modify_event(next_data["props"]["pageProps"]["schedule"]["events"])
+    adapter = session.get_adapter("https://")
+    adapter.content = make_page(next_data).encode()
+    adapter.etag = "v2"
+    apply_events = db.apply_events
+    db.apply_events = lambda *args: 1 / 0
+    try:
+        db.refresh()
+    except ZeroDivisionError:
+        pass
+    db.apply_events = apply_events
+    changes = db.refresh()
+    if not changes.modified:
+        return [f"the second refresh found no changes, etag {db.etag!r}"]
+    return []
+
+
+def main() -> None:
+    next_data = load_fixture()
+    failed = False
+    cases = {case: partial(check_case, next_data, changes) for case, changes in CASES.items()}
+    cases["failed update"] = partial(check_failed_update, next_data)
+    for case, check in cases.items():
+        errors = check()
+        print(f"{case:13} {'FAILED' if errors else 'ok'}")
+        for error in errors:
+            print("  " + error.replace("\n", "\n  ")[:MAX_ERROR_CHARS])
+        failed = failed or bool(errors)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
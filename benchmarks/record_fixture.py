@@ -0,0 +1,48 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Records the __NEXT_DATA__ payload of the schedule page into benchmarks/fixtures, so the
+# benchmarks run offline on the real data layout. Without network access, --synthetic writes a
+# generated schedule with the same layout instead.
+#
+#   python -m benchmarks.record_fixture [--url https://...] [--synthetic 250]
+import argparse
+import gzip
+import json
+import os
+
+import requests
+
+from aiewf import WORLDS_FAIR_2024
+from benchmarks.synthetic import FIXTURE_PATH, make_events, make_next_data
+from extract import find_next_data
+
+
+def record(url: str) -> dict:
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    json_bytes = find_next_data(response.content)
+    if json_bytes is None:
+        raise ValueError(f"No __NEXT_DATA__ found on {url}")
+    return json.loads(json_bytes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=WORLDS_FAIR_2024.schedule_url)
+    parser.add_argument("--synthetic", type=int, metavar="EVENTS", help="generate, do not fetch")
+    parser.add_argument("--output", default=FIXTURE_PATH)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        next_data = make_next_data(make_events(args.synthetic))
+    else:
+        next_data = record(args.url)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    # mtime=0 keeps the file identical between recordings of the same data
+    with open(args.output, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(json.dumps(next_data, sort_keys=True).encode())
+    num_events = len(next_data["props"]["pageProps"]["schedule"]["events"])
+    print(f"wrote {num_events} events to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Benchmark suite of the schedule load, the app filtering, the exports and the facet lists, on
+# the recorded fixture and on synthetic schedules of several sizes. All requests go to an
+# injected session, nothing touches the network. Results are written as JSON, and --compare
+# prints the change of every case against the results of another commit.
+#
+#   python -m benchmarks.suite [--sizes 1000 10000] [--repeat 5] [--output results.json]
+#                              [--compare benchmarks/results/<commit>.json]
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from aiewf import AIEWF, convert_dataframe_to_csv, convert_df_dict_to_excel
+from analytics import ScheduleAnalytics
+from benchmarks.synthetic import (
+    fixture_session,
+    load_fixture,
+    make_events,
+    make_next_data,
+    make_page,
+)
+from similar import SimilarEvents
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+FACETS = ["tracks", "companies", "event_rooms", "dates", "num_presenters", "num_events"]
+
+
+def time_case(run: Callable, repeat: int, number: int = 1) -> dict:
+    run()  # warm-up, e.g. imports and lazily built indexes
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        runs.append((time.perf_counter() - start) / number)
+    return {"min_s": min(runs), "median_s": statistics.median(runs), "runs": runs}
+
+
+def select_events(
+    db: AIEWF,
+    tracks: list | None = None,
+    dates: list | None = None,
+    companies: list | None = None,
+    query: str = "",
+    fav_mask: np.ndarray | None = None,
+) -> pd.DataFrame:
+    # the selection done on every rerun of app.main
+    positions = db.filter_events(tracks=tracks, dates=dates, companies=companies)
+    if query:
+        search_positions, _ = db.search_index.search(query)
+        positions = search_positions[np.isin(search_positions, positions)]
+    if fav_mask is not None:
+        positions = positions[fav_mask[positions]]
+    return db.event_df.iloc[positions]
+
+
+def run_dataset(html: str, repeat: int, cache_dir: str) -> dict[str, dict]:
+    results = {}
+    session = fixture_session(html)
+    results["construct_parse"] = time_case(lambda: AIEWF(cache_dir=None, session=session), repeat)
+    AIEWF(cache_dir=cache_dir, max_age=0, session=session)
+    results["construct_snapshot"] = time_case(
+        lambda: AIEWF(cache_dir=cache_dir, offline=True), repeat
+    )
+    etag_session = fixture_session(html, etag='"fixture"')
+    AIEWF(cache_dir=cache_dir, max_age=0, session=etag_session)
+    results["construct_revalidate_304"] = time_case(
+        lambda: AIEWF(cache_dir=cache_dir, max_age=0, session=etag_session), repeat
+    )
+
+    db = AIEWF(cache_dir=None, session=session)
+    tracks = db.tracks[:2]
+    dates = db.dates[:1]
+    companies = db.companies[:5]
+    fav_mask = np.zeros(db.num_events, dtype=bool)
+    fav_mask[::10] = True
+    filters = {
+        "filter_none": {},
+        "filter_track_date": {"tracks": tracks, "dates": dates},
+        "filter_companies": {"companies": companies},
+        "filter_search": {"query": "agents retrieval"},
+        "filter_all_favorites": {
+            "tracks": tracks,
+            "companies": companies,
+            "query": "agents",
+            "fav_mask": fav_mask,
+        },
+    }
+    for name, kwargs in filters.items():
+        results[name] = time_case(lambda kwargs=kwargs: select_events(db, **kwargs), repeat, 100)
+
+    df_dict = {"events": db.event_df, "presenters": db.presenter_df, "companies": db.company_df}
+    results["export_excel"] = time_case(lambda: convert_df_dict_to_excel(df_dict), repeat)
+    results["export_csv"] = time_case(lambda: convert_dataframe_to_csv(db.event_df), repeat)
+    results["export_ics"] = time_case(lambda: "".join(db.iter_ics()), repeat)
+    results["similar_build"] = time_case(
+        lambda: SimilarEvents(db.data_version, db.event_df, db.event_presenters), repeat
+    )
+    results["recommend"] = time_case(
+        lambda: db.recommend(np.flatnonzero(fav_mask)), repeat, number=100
+    )
+    results["analytics_build"] = time_case(
+        lambda: ScheduleAnalytics(db.data_version, db.event_df, db.event_presenters), repeat
+    )
+    positions = db.filter_events(tracks=tracks)
+    analytics = db.analytics
+    results["analytics_charts"] = time_case(
+        lambda: (
+            analytics.room_occupancy(positions),
+            analytics.track_load(positions),
+            analytics.company_talks(positions),
+            analytics.concurrent_sessions(positions),
+        ),
+        repeat,
+        number=20,
+    )
+    results["facets"] = time_case(
+        lambda: [getattr(db, facet) for facet in FACETS], repeat, number=1000
+    )
+    return results
+
+
+def get_commit() -> str:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return output.stdout.strip()
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> list[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    # the fastest run is the least disturbed by other load on the machine
+    print(f"\ncompared with {baseline['meta']['commit']} (fastest run, new / old):")
+    regressions = []
+    for key, result in results["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        ratio = result["min_s"] / old["min_s"]
+        flag = " REGRESSION" if ratio > threshold else ""
+        print(f"  {key:40} {old['min_s'] * 1000:10.3f} ms -> {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000])
+    parser.add_argument("--presenters-per-event", type=int, default=3, help="at most")
+    parser.add_argument("--companies", type=int, help="default: a third of the presenters")
+    parser.add_argument("--no-fixture", action="store_true", help="skip the recorded fixture")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="default: benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="regression ratio")
+    args = parser.parse_args()
+
+    datasets = {}
+    if not args.no_fixture:
+        datasets["fixture"] = make_page(load_fixture())
+    for size in args.sizes:
+        events = make_events(
+            size, max_presenters=args.presenters_per_event, num_companies=args.companies
+        )
+        datasets[f"synthetic_{size}"] = make_page(make_next_data(events))
+
+    commit = get_commit()
+    results = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for dataset, html in datasets.items():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for case, result in run_dataset(html, args.repeat, cache_dir).items():
+                key = f"{dataset}/{case}"
+                results["results"][key] = result
+                print(f"{key:40} median {result['median_s'] * 1000:10.3f} ms")
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output_path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import gzip
+import json
+import os
+import random
+
+import requests
+from requests.adapters import BaseAdapter
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "next_data.json.gz")
+TRACKS = ["Keynotes", "RAG & LLM Frameworks", "Multimodality", "Agents", "CodeGen", "Evals & Ops"]
+ROOMS = ["Salon 1", "Salon 2", "Salon 9", "Grand Ballroom", "Golden Gate", None]
+WORDS = (
+    "agents retrieval evals inference latency embeddings vector database fine tuning gpu "
+    "open source models prompts reasoning copilots multimodal voice serving tokens context "
+    "memory tools planning benchmarks observability guardrails production scale"
+).split()
+
+
+def make_text(rng: random.Random, num_words: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(num_words)]
+    for i in range(12, num_words, 12):
+        words[i] = "\n" + words[i]
+    return " ".join(words)
+
+
+def make_events(
+    num_events: int,
+    max_presenters: int = 3,
+    seed: int = 0,
+    num_presenters: int | None = None,
+    num_companies: int | None = None,
+) -> list[dict]:
+    # Every event gets 0 to max_presenters presenters, drawn from a pool of num_presenters people
+    # working for num_companies companies.
+    rng = random.Random(seed)
+    num_presenters = num_presenters or max(1, num_events * max_presenters // 2)
+    num_companies = num_companies or max(1, num_presenters // 3)
+    events = []
+    for i in range(num_events):
+        day = i % 3
+        start_minute = 8 * 60 + rng.randrange(0, 10 * 60, 15)
+        duration = rng.choice([15, 30, 45, 60])
+        presenters = []
+        for _ in range(rng.randrange(0, max_presenters + 1)):
+            presenter_id = rng.randrange(num_presenters)
+            company_id = presenter_id % num_companies
+            presenters.append(
+                {
+                    "id": presenter_id,
+                    "attributes": {
+                        "name": f"Presenter {presenter_id} ",
+                        "tagline": f"Engineer at Company {company_id}",
+                        "about": make_text(rng, 40) if presenter_id % 5 else None,
+                        "socialLinks": f"x.com/p{presenter_id}" if presenter_id % 3 else None,
+                        "company": {
+                            "data": {
+                                "id": company_id,
+                                "attributes": {
+                                    "name": f"Company {company_id}",
+                                    "link": f"company{company_id}.com",
+                                    "socialLinks": "" if company_id % 2 else None,
+                                },
+                            }
+                        },
+                    },
+                }
+            )
+        since = f"2024-06-{25 + day:02d}T{start_minute // 60:02d}:{start_minute % 60:02d}:00"
+        end_minute = start_minute + duration
+        till = f"2024-06-{25 + day:02d}T{end_minute // 60:02d}:{end_minute % 60:02d}:00"
+        events.append(
+            {
+                "title": f"Talk {i}: {make_text(rng, 5)}",
+                "trackName": rng.choice(TRACKS),
+                "presenters": presenters,
+                "room": rng.choice(ROOMS),
+                "since": since,
+                "till": till,
+                "about": make_text(rng, 80) if i % 7 else None,
+                "slug": f"talk-{i}",
+                "type": "talk",
+            }
+        )
+    return events
+
+
+def make_next_data(events: list[dict]) -> dict:
+    return {
+        "props": {"pageProps": {"schedule": {"events": events}, "__N_SSG": True}},
+        "page": "/worldsfair/2024/schedule",
+        "query": {},
+        "buildId": "synthetic",
+    }
+
+
+def make_schedule_html(events: list[dict], padding: int = 0) -> str:
+    return make_page(make_next_data(events), padding)
+
+
+def make_page(next_data: dict, padding: int = 0) -> str:
+    next_data = json.dumps(next_data)
+    filler = "<div class='card'><p>Lorem ipsum</p></div>" * padding
+    return (
+        "<!DOCTYPE html><html><head><title>Schedule</title></head><body>"
+        f"<div id='__next'>{filler}</div>"
+        f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+        "</body></html>"
+    )
+
+
+def load_fixture(path: str = FIXTURE_PATH) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureAdapter(BaseAdapter):
+    # Answers every request with the same page, so a schedule loads without the network. With an
+    # etag, conditional requests for the same page are answered with 304.
+    def __init__(self, content: bytes, etag: str = ""):
+        super().__init__()
+        self.content = content
+        self.etag = etag
+        self.num_requests = 0
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        self.num_requests += 1
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        if self.etag:
+            response.headers["ETag"] = self.etag
+        if self.etag and request.headers.get("If-None-Match") == self.etag:
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = self.content
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def fixture_session(html: str, etag: str = "") -> requests.Session:
+    session = requests.Session()
+    adapter = FixtureAdapter(html.encode(), etag)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
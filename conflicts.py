@@ -0,0 +1,55 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import numpy as np
+
+
+def overlapping_pairs(
+    starts: np.ndarray, ends: np.ndarray, groups: np.ndarray | None = None
+) -> np.ndarray:
+    # Returns an (k, 2) array of index pairs (i, j) of the half-open intervals [start, end) that
+    # overlap, optionally only within the same group. Sweep over the intervals sorted by start:
+    # the partners of an interval are the ones starting after it but before its end, found with
+    # one binary search each. O(n log n + k) instead of comparing all pairs.
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    group_codes = (
+        np.zeros(len(starts), np.int64) if groups is None else np.asarray(groups, np.int64)
+    )
+    n = len(starts)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    order = np.lexsort((starts, group_codes))
+    sorted_groups = group_codes[order]
+    # Composite (group, start rank) keys keep the sort order, and rank(start_j) < rank(end_i)
+    # holds exactly when start_j < end_i.
+    all_starts = np.sort(starts)
+    start_keys = sorted_groups * (n + 1) + np.searchsorted(all_starts, starts[order], "left")
+    end_keys = sorted_groups * (n + 1) + np.searchsorted(all_starts, ends[order], "left")
+    stop = np.searchsorted(start_keys, end_keys, side="left")
+    first = np.arange(1, n + 1)
+    counts = np.maximum(stop - first, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    left = np.repeat(np.arange(n), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = np.repeat(first, counts) + offsets
+    pairs = np.column_stack((order[left], order[right]))
+    # an empty interval starting together with another one does not overlap it
+    return pairs[starts[pairs[:, 0]] < ends[pairs[:, 1]]]
+
+
+def max_itinerary(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # Indices of a maximum-size set of non-overlapping intervals (greedy by earliest end).
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    order = np.lexsort((starts, ends))
+    selected = []
+    last_end = np.iinfo(np.int64).min
+    for i, start, end in zip(
+        order.tolist(), starts[order].tolist(), ends[order].tolist(), strict=True
+    ):
+        if start >= last_end:
+            selected.append(i)
+            last_end = end
+    return np.sort(np.asarray(selected, dtype=np.int64))
@@ -1,14 +1,159 @@
-from aiewf import AIEWF, convert_df_dict_to_excel
+import os
+
+import click
+import pandas as pd
+
+from aiewf import AIEWF, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL
+from editions import load_schedule
+from excel import write_excel
+from ics import write_calendar
+
+TABLES = ["events", "presenters", "companies", "event_presenters"]
+FORMATS = ["xlsx", "csv", "parquet", "feather", "jsonl", "ics"]
+# compression codecs each format can write, the first one is the default
+COMPRESSIONS = {
+    "xlsx": ["none"],
+    "csv": ["none", "gzip", "bz2", "xz", "zstd"],
+    "parquet": ["snappy", "zstd", "gzip", "lz4", "none"],
+    "feather": ["lz4", "zstd", "none"],
+    "jsonl": ["none", "gzip", "bz2", "xz", "zstd"],
+    "ics": ["none"],
+}
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+
+
+def get_tables(db: AIEWF, tables: list[str]) -> dict[str, pd.DataFrame]:
+    # event slugs and presenter/company ids become columns, so the tables can be joined
+    all_tables = {
+        "events": db.event_df,
+        "presenters": db.presenter_table,
+        "companies": db.company_table,
+        "event_presenters": db.event_presenters,
+    }
+    return {
+        name: df.reset_index() if df.index.name else df
+        for name, df in all_tables.items()
+        if name in tables
+    }
+
+
+def dump_tables(
+    db: AIEWF,
+    output_dir: str,
+    file_format: str,
+    tables: list[str],
+    compression: str | None = None,
+    name: str = "aiewf_schedule",
+) -> list[str]:
+    compression = compression or COMPRESSIONS[file_format][0]
+    if compression not in COMPRESSIONS[file_format]:
+        raise ValueError(f"{file_format} does not support {compression} compression")
+    codec = None if compression == "none" else compression
+    os.makedirs(output_dir, exist_ok=True)
+    base_path = os.path.join(output_dir, name)
+
+    if file_format == "xlsx":
+        write_excel(get_tables(db, tables), f"{base_path}.xlsx")
+        return [f"{base_path}.xlsx"]
+    if file_format == "ics":
+        write_ics(db, f"{base_path}.ics")
+        return [f"{base_path}.ics"]
+
+    paths = []
+    for table, df in get_tables(db, tables).items():
+        path = f"{base_path}_{table}.{file_format}"
+        if file_format == "parquet":
+            df.to_parquet(path, index=False, compression=codec)
+        elif file_format == "feather":
+            df.to_feather(path, compression=codec or "uncompressed")
+        elif file_format == "csv":
+            path += COMPRESSION_SUFFIXES.get(compression, "")
+            df.to_csv(path, index=False, compression=codec)
+        elif file_format == "jsonl":
+            path += COMPRESSION_SUFFIXES.get(compression, "")
+            df.to_json(path, orient="records", lines=True, date_format="iso", compression=codec)
+        paths.append(path)
+    return paths
+
+
+def write_ics(db: AIEWF, output_path: str):
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        write_calendar(f, db.vevents, "AI Engineer World's Fair")
 
 
 def dump_data(output_path: str = "aiewf_schedule.xlsx"):
     db = AIEWF()
 
     d = {"events": db.event_df, "presenters": db.presenter_df, "companies": db.company_df}
-    buffer = convert_df_dict_to_excel(d)
-    with open(output_path, "wb") as f:
-        f.write(buffer)
+    write_excel(d, output_path)
+
+
+def dump_calendar(output_path: str = "aiewf_schedule.ics"):
+    write_ics(AIEWF(), output_path)
+
+
+@click.command()
+@click.option(
+    "--format",
+    "-f",
+    "formats",
+    type=click.Choice(FORMATS),
+    multiple=True,
+    default=["xlsx"],
+    show_default=True,
+    help="Output format, can be given several times.",
+)
+@click.option(
+    "--table",
+    "-t",
+    "tables",
+    type=click.Choice(TABLES),
+    multiple=True,
+    help="Table to dump, can be given several times. [default: events, presenters, companies]",
+)
+@click.option("--output-dir", "-o", default=".", show_default=True, type=click.Path())
+@click.option("--name", default="aiewf_schedule", show_default=True, help="Output file prefix.")
+@click.option(
+    "--compression",
+    type=click.Choice(sorted({c for codecs in COMPRESSIONS.values() for c in codecs})),
+    help="Compression codec. [default: snappy for parquet, lz4 for feather, none otherwise]",
+)
+@click.option("--offline", is_flag=True, help="Only read the cached snapshot, never fetch.")
+@click.option("--cache-dir", default=DEFAULT_CACHE_DIR, show_default=True, type=click.Path())
+@click.option(
+    "--max-age",
+    default=DEFAULT_CACHE_TTL,
+    show_default=True,
+    help="Snapshot age in seconds after which the schedule is fetched again.",
+)
+@click.option(
+    "--sources",
+    envvar="AIEWF_SOURCES",
+    default="",
+    help="Several editions, e.g. 'worldsfair-2024=https://...;other=https://...'.",
+)
+def main(formats, tables, output_dir, name, compression, offline, cache_dir, max_age, sources):
+    """Dump the schedule tables to files."""
+    tables = list(tables) or ["events", "presenters", "companies"]
+    for file_format in formats:
+        if compression and compression not in COMPRESSIONS[file_format]:
+            raise click.BadParameter(
+                f"{file_format} does not support {compression} compression",
+                param_hint="--compression",
+            )
+    try:
+        db = load_schedule(sources, cache_dir, max_age, offline)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    for file_format in dict.fromkeys(formats):
+        try:
+            paths = dump_tables(db, output_dir, file_format, tables, compression, name)
+        except ImportError as e:
+            # e.g. zstd compression of csv and jsonl files needs the zstandard package
+            raise click.ClickException(str(e)) from e
+        for path in paths:
+            click.echo(path)
 
 
 if __name__ == "__main__":
-    dump_data()
+    main()
@@ -0,0 +1,207 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from aiewf import (
+    AIEWF,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_TTL,
+    ScheduleChanges,
+    ScheduleSource,
+    mount_retries,
+)
+from ics import VEVENTS_VERSION, render_vevents
+from snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+def parse_sources(spec: str) -> list[ScheduleSource]:
+    # "worldsfair-2024=https://...;summit-2023=https://..."
+    sources = []
+    for item in spec.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        edition, sep, schedule_url = item.partition("=")
+        if not sep or not edition.strip() or not schedule_url.strip():
+            raise ValueError(f"Invalid schedule source: {item}")
+        sources.append(ScheduleSource(edition.strip(), schedule_url.strip()))
+    check_editions(sources)
+    return sources
+
+
+def check_editions(sources: list[ScheduleSource]) -> None:
+    # the editions are keyed by name, a duplicate would silently replace the other source
+    editions = [source.edition for source in sources]
+    duplicates = sorted({edition for edition in editions if editions.count(edition) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate schedule editions: {', '.join(duplicates)}")
+
+
+def prefix_index(df: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    return df.set_axis(prefix + df.index.astype(str)).rename_axis(df.index.name)
+
+
+class MergedSchedule(AIEWF):
+    # Several editions merged into one dataset with an `edition` column. Event slugs and presenter
+    # and company ids are prefixed with the edition name to keep them unique.
+
+    def __init__(
+        self,
+        editions: dict[str, AIEWF],
+        errors: dict[str, Exception] | None = None,
+        cache_dir: str | None = None,
+    ):
+        # The first edition is the primary source, e.g. for schedule_url. Every edition keeps its
+        # own snapshot of the tables, the store of the merged schedule only holds the derived
+        # structures, e.g. the search index.
+        store = SnapshotStore(os.path.join(cache_dir, "+".join(editions))) if cache_dir else None
+        self.init_state(next(iter(editions.values())).source, store=store)
+        self.editions = editions
+        self.errors = errors or {}
+        self.merge()
+
+    def merge(self) -> None:
+        event_dfs = []
+        presenter_tables = []
+        company_tables = []
+        event_presenters = []
+        event_hashes = {}
+        versions = []
+        for edition, db in self.editions.items():
+            prefix = f"{edition}/"
+            with db.tables_lock:
+                event_df = prefix_index(db.event_df, prefix)
+                event_df.insert(0, "edition", edition)
+                event_dfs.append(event_df)
+                presenter_table = prefix_index(db.presenter_table, prefix)
+                presenter_table.insert(0, "edition", edition)
+                presenter_tables.append(presenter_table)
+                company_table = prefix_index(db.company_table, prefix)
+                company_table.insert(0, "edition", edition)
+                company_tables.append(company_table)
+                edition_presenters = db.event_presenters.copy()
+                for col in ("slug", "presenter_id", "company_id"):
+                    edition_presenters[col] = prefix + edition_presenters[col].astype(str)
+                event_presenters.append(edition_presenters)
+                event_hashes.update({prefix + k: v for k, v in db.event_hashes.items()})
+                versions.append(f"{edition}:{db.data_version}")
+        self.fetched_at = min(db.fetched_at for db in self.editions.values())
+        self.set_tables(
+            data_version=hashlib.sha256("|".join(versions).encode()).hexdigest()[:16],
+            event_df=pd.concat(event_dfs).sort_values(by="since", kind="stable"),
+            presenter_table=pd.concat(presenter_tables),
+            company_table=pd.concat(company_tables),
+            event_presenters=pd.concat(event_presenters, ignore_index=True),
+            event_hashes=event_hashes,
+        )
+        if self.store is not None:
+            try:
+                self.store.add_version(self.data_version)
+            except OSError:
+                logger.exception("Could not create the snapshot in %s", self.store.path)
+
+    @property
+    def vevents(self) -> pd.Series:
+        # the UIDs of each edition use the domain of its own schedule page
+        with self.tables_lock:
+            if self._vevents is None:
+                self._vevents = self.get_derived("vevents", self.render_vevents, VEVENTS_VERSION)
+            return self._vevents
+
+    def render_vevents(self) -> pd.Series:
+        vevents = [
+            render_vevents(
+                self.event_df[self.event_df["edition"] == edition],
+                urlsplit(db.event_base_url).hostname or "aiewf",
+                self.fetched_at,
+            )
+            for edition, db in self.editions.items()
+        ]
+        return pd.concat(vevents).reindex(self.event_df.index)
+
+    def touch_snapshot(self) -> None:
+        for db in self.editions.values():
+            db.touch_snapshot()
+        self.fetched_at = min(db.fetched_at for db in self.editions.values())
+
+    def refresh(self) -> ScheduleChanges:
+        changes = ScheduleChanges()
+        with self.refresh_lock:
+            with ThreadPoolExecutor(max_workers=len(self.editions)) as executor:
+                futures = {
+                    executor.submit(db.refresh): edition for edition, db in self.editions.items()
+                }
+                for future in as_completed(futures):
+                    edition = futures[future]
+                    try:
+                        edition_changes = future.result()
+                    except Exception:
+                        logger.exception("Refreshing edition %s failed", edition)
+                        continue
+                    prefix = f"{edition}/"
+                    changes.added += [prefix + key for key in edition_changes.added]
+                    changes.removed += [prefix + key for key in edition_changes.removed]
+                    changes.modified += [prefix + key for key in edition_changes.modified]
+            if changes:
+                self.merge()
+        return changes
+
+
+def load_editions(
+    sources: list[ScheduleSource],
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    max_age: float = DEFAULT_CACHE_TTL,
+    offline: bool = False,
+    max_workers: int | None = None,
+) -> MergedSchedule:
+    # Fetches and parses all sources concurrently over one pooled session. A failing source is
+    # logged and left out, the load only fails if no source could be loaded.
+    if not sources:
+        raise ValueError("No schedule sources given")
+    check_editions(sources)
+    max_workers = max_workers or len(sources)
+    import requests
+
+    session = requests.Session()
+    for source in sources:
+        mount_retries(session, source, pool_size=max_workers)
+
+    editions = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(AIEWF, cache_dir, max_age, offline, source, session): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                editions[source.edition] = future.result()
+            except Exception as e:
+                logger.exception("Loading edition %s failed", source.edition)
+                errors[source.edition] = e
+    if not editions:
+        raise ValueError("None of the schedule sources could be loaded") from next(
+            iter(errors.values()), None
+        )
+    editions = {s.edition: editions[s.edition] for s in sources if s.edition in editions}
+    return MergedSchedule(editions, errors, cache_dir)
+
+
+def load_schedule(
+    sources: str = "",
+    cache_dir: str | None = DEFAULT_CACHE_DIR,
+    max_age: float = DEFAULT_CACHE_TTL,
+    offline: bool = False,
+) -> AIEWF:
+    # the default edition, or the merged editions of an AIEWF_SOURCES style spec
+    if sources:
+        return load_editions(parse_sources(sources), cache_dir, max_age, offline)
+    return AIEWF(cache_dir, max_age, offline)
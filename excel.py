@@ -0,0 +1,121 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Streaming Excel writer. Rows go through xlsxwriter's constant_memory mode, which flushes every
+# finished row to a temporary file, and the workbook is written to a path or file handle.
+import os
+import re
+from typing import IO
+
+import pandas as pd
+
+MAX_COL_WIDTH = 255  # the widest column Excel allows
+DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+DATE_FORMAT = "yyyy-mm-dd"
+WRITE_CHUNK_ROWS = 10_000
+URL_PATTERN = r"(?:https?|ftp|mailto):"
+
+
+def clean_excel_sheet_name(input_str, sheet_index: int) -> str:
+    cleaned_str = re.sub(r'[\/:*?"<>|]', "_", input_str)
+    cleaned_str = re.sub(r'[\'"]', "", cleaned_str)
+    cleaned_str = cleaned_str.strip()
+
+    if len(cleaned_str) == 0:
+        cleaned_str = f"Sheet{sheet_index}"
+    elif len(cleaned_str) > 31:
+        cleaned_str = cleaned_str[:31]
+
+    return cleaned_str
+
+
+def column_width(values: pd.Series, sample_rows: int | None = None) -> int:
+    # Length of the longest value or of the header, plus a little extra space. Categoricals are
+    # measured on their categories, other columns with vectorized string lengths.
+    header_len = len(str(values.name))
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Series(values.cat.categories)
+    elif sample_rows is not None and len(values) > sample_rows:
+        values = values.sample(sample_rows, random_state=0)
+    if pd.api.types.is_string_dtype(values):
+        lengths = values.str.len()
+    else:
+        lengths = values.astype(str).str.len()
+    max_len = lengths.max() if len(lengths) else 0
+    max_len = 0 if pd.isna(max_len) else int(max_len)
+    return min(max(max_len, header_len) + 1, MAX_COL_WIDTH)
+
+
+def column_values(values: pd.Series) -> list:
+    # Python values ready for xlsxwriter, missing values become None. Excel has no time zones,
+    # so aware timestamps are written as UTC.
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is not None:
+            values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+        return [None if pd.isna(v) else v.to_pydatetime() for v in values]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return [None if v is None or v is pd.NA or v != v else v for v in values.tolist()]
+
+
+def is_date_column(values: pd.Series) -> bool:
+    # Python dates, like the event date column, need a date format to show up as dates
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Series(values.cat.categories)
+    elif values.dtype != object:
+        return False
+    return pd.api.types.infer_dtype(values.dropna().head(100)) == "date"
+
+
+def column_writer(worksheet, values: pd.Series, formats: dict):
+    # Picks the typed xlsxwriter method of a column once, instead of letting write() guess the
+    # type of every cell. Text columns holding links keep write(), which turns them into links.
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return worksheet.write_datetime, formats["datetime"]
+    if is_date_column(values):
+        return worksheet.write_datetime, formats["date"]
+    if pd.api.types.is_bool_dtype(values):
+        return worksheet.write_boolean, None
+    if pd.api.types.is_numeric_dtype(values):
+        return worksheet.write_number, None
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Series(values.cat.categories)
+    if pd.api.types.is_string_dtype(values):
+        if values.str.match(URL_PATTERN).any():
+            return worksheet.write, None
+        return worksheet.write_string, None
+    return worksheet.write, None
+
+
+def write_excel(
+    dfs: dict[str, pd.DataFrame],
+    output: str | os.PathLike | IO[bytes],
+    adjust_col_width: bool = False,
+    width_sample_rows: int | None = None,
+) -> None:
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(output, {"constant_memory": True}) as workbook:
+        header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+        formats = {
+            "datetime": workbook.add_format({"num_format": DATETIME_FORMAT}),
+            "date": workbook.add_format({"num_format": DATE_FORMAT}),
+        }
+        for i, (sheet_name, df) in enumerate(dfs.items()):
+            worksheet = workbook.add_worksheet(clean_excel_sheet_name(sheet_name, i))
+            writers = []
+            for col_index, col in enumerate(df.columns):
+                values = df.iloc[:, col_index]
+                writers.append(column_writer(worksheet, values, formats))
+                if adjust_col_width:
+                    width = column_width(values, width_sample_rows)
+                    worksheet.set_column(col_index, col_index, width)
+                worksheet.write_string(0, col_index, str(col), header_format)
+
+            # rows are converted to Python values chunk by chunk, never the whole sheet at once
+            for start in range(0, len(df), WRITE_CHUNK_ROWS):
+                chunk = df.iloc[start : start + WRITE_CHUNK_ROWS]
+                columns = [column_values(chunk.iloc[:, j]) for j in range(chunk.shape[1])]
+                for row, row_values in enumerate(zip(*columns, strict=True), start=start + 1):
+                    for col_index, value in enumerate(row_values):
+                        if value is not None:
+                            write, cell_format = writers[col_index]
+                            write(row, col_index, value, cell_format)
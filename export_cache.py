@@ -0,0 +1,55 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+import pandas as pd
+
+from profiling import span
+
+ExportData = bytes | str
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    content_hash = hashlib.sha1()
+    content_hash.update(str(list(df.columns)).encode())
+    content_hash.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return content_hash.hexdigest()
+
+
+class ExportCache:
+    # LRU cache of encoded export files, bounded by the total size of the cached files.
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.entries: OrderedDict[Hashable, ExportData] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key: Hashable, render: Callable[[], ExportData]) -> ExportData:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        with span("export encode"):
+            data = render()
+        self.put(key, data)
+        return data
+
+    def put(self, key: Hashable, data: ExportData) -> None:
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.num_bytes -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.num_bytes += size
+            while self.num_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.num_bytes -= len(evicted)
@@ -0,0 +1,58 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import hashlib
+import json
+
+from profiling import span
+
+NEXT_DATA_MARKERS = (b'id="__NEXT_DATA__"', b"id='__NEXT_DATA__'", b"id=__NEXT_DATA__")
+SCRIPT_END = b"</script>"
+EVENTS_PATH = ("props", "pageProps", "schedule", "events")
+
+
+def find_next_data(html: bytes) -> bytes | None:
+    for marker in NEXT_DATA_MARKERS:
+        marker_pos = html.find(marker)
+        if marker_pos != -1:
+            break
+    else:
+        return None
+    script_start = html.rfind(b"<script", 0, marker_pos)
+    content_start = html.find(b">", marker_pos)
+    content_end = html.find(SCRIPT_END, content_start)
+    if script_start == -1 or content_start == -1 or content_end == -1:
+        return None
+    return html[content_start + 1 : content_end].strip()
+
+
+def find_next_data_bs4(html: bytes) -> bytes | None:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+    script_block = soup.find("script", id="__NEXT_DATA__")
+    if script_block is None:
+        return None
+    return script_block.text.encode()
+
+
+def decode_events(json_bytes: bytes) -> list[dict]:
+    data = json.loads(json_bytes)
+    try:
+        for key in EVENTS_PATH:
+            data = data[key]
+    except (KeyError, TypeError) as e:
+        raise ValueError("Data has an unexpected format") from e
+    return data
+
+
+def extract_events(html: bytes | str, use_bs4: bool = False) -> tuple[list[dict], str]:
+    if isinstance(html, str):
+        html = html.encode()
+    with span("extract html"):
+        json_bytes = None if use_bs4 else find_next_data(html)
+        if json_bytes is None:
+            json_bytes = find_next_data_bs4(html)
+    if json_bytes is None:
+        raise ValueError("No data found")
+    data_version = hashlib.sha256(json_bytes).hexdigest()[:16]
+    with span("decode json"):
+        return decode_events(json_bytes), data_version
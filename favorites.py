@@ -0,0 +1,123 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+
+# toggles appended by one process between two compactions of the SQLite log
+COMPACT_EVERY = int(os.getenv("FAV_EVENTS_COMPACT_EVERY", 1000))
+
+
+class FavoritesBackend(ABC):
+    # Favorite events per user, keyed by event slug. Writers only send the changes.
+
+    @abstractmethod
+    def load(self, user_id: str) -> set[str]: ...
+
+    @abstractmethod
+    def apply(self, user_id: str, added: Iterable[str], removed: Iterable[str]) -> None: ...
+
+
+class FileFavorites(FavoritesBackend):
+    # The original single-file store: one set shared by all users, rewritten on every change.
+    # Only suitable for local single-user use.
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self, user_id: str) -> set[str]:
+        try:
+            with open(self.path) as f:
+                return set(f.read().splitlines())
+        except FileNotFoundError:
+            return set()
+
+    def apply(self, user_id: str, added: Iterable[str], removed: Iterable[str]) -> None:
+        with self.lock:
+            event_ids = (self.load(user_id) | set(added)) - set(removed)
+            with open(self.path, "w") as f:
+                f.write("\n".join(sorted(event_ids)))
+
+
+class SQLiteFavorites(FavoritesBackend):
+    # Append-only log of favorite toggles in a SQLite database in WAL mode, so readers do not
+    # block the writer. The current state of a user is the latest toggle per event. The log is
+    # compacted on startup and every COMPACT_EVERY toggles, so it stays about as long as the
+    # number of favorites.
+
+    def __init__(self, path: str, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.local = threading.local()
+        self.compact_every = compact_every
+        self.num_appended = 0
+        self.count_lock = threading.Lock()
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS favorite_log ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+                "event_id TEXT NOT NULL, is_favorite INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS favorite_log_user "
+                "ON favorite_log (user_id, event_id, seq)"
+            )
+        self.compact()
+
+    def connect(self) -> sqlite3.Connection:
+        # one connection per thread, Streamlit runs every session in its own thread
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self, user_id: str) -> set[str]:
+        # SQLite returns the bare columns of the row holding MAX(seq)
+        rows = self.connect().execute(
+            "SELECT event_id, is_favorite, MAX(seq) FROM favorite_log "
+            "WHERE user_id = ? GROUP BY event_id",
+            (user_id,),
+        )
+        return {event_id for event_id, is_favorite, _ in rows if is_favorite}
+
+    def apply(self, user_id: str, added: Iterable[str], removed: Iterable[str]) -> None:
+        now = time.time()
+        rows = [(user_id, event_id, 1, now) for event_id in added]
+        rows += [(user_id, event_id, 0, now) for event_id in removed]
+        if not rows:
+            return
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT INTO favorite_log (user_id, event_id, is_favorite, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        with self.count_lock:
+            self.num_appended += len(rows)
+            if self.num_appended < self.compact_every:
+                return
+            self.num_appended = 0
+        self.compact()
+
+    def compact(self) -> None:
+        # drops the toggles that are superseded by a later one
+        with self.connect() as conn:
+            conn.execute(
+                "DELETE FROM favorite_log WHERE seq NOT IN "
+                "(SELECT MAX(seq) FROM favorite_log GROUP BY user_id, event_id)"
+            )
+            conn.execute("DELETE FROM favorite_log WHERE is_favorite = 0")
+
+
+def get_favorites_backend(backend: str, path: str) -> FavoritesBackend:
+    if backend == "file":
+        return FileFavorites(path)
+    if backend == "sqlite":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return SQLiteFavorites(path)
+    raise ValueError(f"Unknown favorites backend: {backend}")
@@ -0,0 +1,67 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+FACET_COLS = {"edition": "edition", "track": "trackName", "date": "date", "room": "room"}
+
+
+def group_positions(values: pd.Series | np.ndarray) -> dict:
+    # maps every distinct value to the sorted row positions holding it
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return {}
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = order[(codes < 0).sum() :]
+    return dict(zip(uniques, np.split(order, np.cumsum(counts)[:-1]), strict=True))
+
+
+class FilterIndex:
+    # Inverted indexes from facet values to event_df row positions, built once per data version.
+
+    def __init__(self, event_df: pd.DataFrame, event_presenters: pd.DataFrame):
+        self.num_rows = len(event_df)
+        self.positions = {
+            facet: group_positions(event_df[col])
+            for facet, col in FACET_COLS.items()
+            if col in event_df
+        }
+        event_positions = event_df.index.get_indexer(event_presenters["slug"])
+        company_pairs = pd.DataFrame(
+            {"company": event_presenters["company"].to_numpy(), "position": event_positions}
+        )
+        company_pairs = company_pairs[company_pairs["position"] >= 0].drop_duplicates()
+        company_pairs = company_pairs.sort_values("position", kind="stable")
+        company_positions = group_positions(company_pairs["company"].to_numpy())
+        positions = company_pairs["position"].to_numpy(dtype=np.int32)
+        self.positions["company"] = {
+            company: positions[rows] for company, rows in company_positions.items()
+        }
+
+    def lookup(self, facet: str, values: Iterable) -> np.ndarray:
+        facet_positions = self.positions.get(facet, {})
+        arrays = [facet_positions[value] for value in values if value in facet_positions]
+        if not arrays:
+            return np.empty(0, dtype=np.int32)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def select(self, **selected: Iterable | None) -> np.ndarray:
+        # Returns the sorted row positions matching all non-empty facet selections, the values
+        # within one facet are combined with OR.
+        result = None
+        for facet, values in selected.items():
+            if not values:
+                continue
+            positions = self.lookup(facet, values)
+            result = (
+                positions
+                if result is None
+                else np.intersect1d(result, positions, assume_unique=True)
+            )
+        if result is None:
+            return np.arange(self.num_rows, dtype=np.int32)
+        return result
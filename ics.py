@@ -0,0 +1,127 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# iCalendar (RFC 5545) export. Every event is rendered once into a VEVENT block, a calendar of
+# any subset of the events is then streamed as the concatenation of the blocks.
+import datetime as dt
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+import pandas as pd
+
+PRODID = "-//LOLML GmbH//AIEWF Schedule Browser//EN"
+MAX_LINE_OCTETS = 75
+# version of the rendered blocks cached in the snapshot, to be increased with every format change
+VEVENTS_VERSION = 1
+
+
+def escape_text(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    # Lines longer than 75 octets continue on the next line after a space, without splitting
+    # multi-byte characters.
+    if len(line) <= MAX_LINE_OCTETS and len(line.encode()) <= MAX_LINE_OCTETS:
+        return line + "\r\n"
+    if line.isascii():
+        step = MAX_LINE_OCTETS - 1
+        parts = [line[:MAX_LINE_OCTETS]]
+        parts += [" " + line[i : i + step] for i in range(MAX_LINE_OCTETS, len(line), step)]
+        return "\r\n".join(parts) + "\r\n"
+    parts = []
+    current = []
+    size = 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > MAX_LINE_OCTETS:
+            parts.append("".join(current))
+            current = [" "]
+            size = 1
+        current.append(char)
+        size += char_size
+    parts.append("".join(current))
+    return "\r\n".join(parts) + "\r\n"
+
+
+def format_timestamps(timestamps: pd.Series) -> pd.Series:
+    # times without a time zone are written as floating local times, missing times as ""
+    if timestamps.dt.tz is not None:
+        formatted = timestamps.dt.tz_convert("UTC").dt.strftime("%Y%m%dT%H%M%SZ")
+    else:
+        formatted = timestamps.dt.strftime("%Y%m%dT%H%M%S")
+    return formatted.astype(object).fillna("")
+
+
+def render_vevent(
+    uid: str,
+    dtstamp: str,
+    dtstart: str,
+    dtend: str,
+    title: str,
+    room: str,
+    link: str,
+    about: str,
+) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{dtstart}",
+    ]
+    if dtend:
+        lines.append(f"DTEND:{dtend}")
+    lines.append(f"SUMMARY:{escape_text(title)}")
+    if room and room != "Unknown":
+        lines.append(f"LOCATION:{escape_text(room)}")
+    if link:
+        lines.append(f"URL:{link}")
+    if about:
+        lines.append(f"DESCRIPTION:{escape_text(about)}")
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+
+def render_vevents(event_df: pd.DataFrame, uid_domain: str, fetched_at: float) -> pd.Series:
+    # VEVENT blocks indexed like event_df, empty for events without a start time. The UID is
+    # built from the event slug, so calendar apps update events on re-import.
+    dtstamp = dt.datetime.fromtimestamp(fetched_at, dt.UTC).strftime("%Y%m%dT%H%M%SZ")
+    texts = {
+        col: event_df[col].astype(object).fillna("") for col in ("title", "room", "link", "about")
+    }
+    blocks = [
+        render_vevent(f"{slug}@{uid_domain}", dtstamp, dtstart, dtend, title, room, link, about)
+        if dtstart
+        else ""
+        for slug, dtstart, dtend, title, room, link, about in zip(
+            event_df.index,
+            format_timestamps(event_df["since"]),
+            format_timestamps(event_df["till"]),
+            texts["title"],
+            texts["room"],
+            texts["link"],
+            texts["about"],
+            strict=True,
+        )
+    ]
+    return pd.Series(blocks, index=event_df.index, dtype=object)
+
+
+def iter_calendar(vevents: Iterable[str], name: str = "") -> Iterator[str]:
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN"]
+    if name:
+        header.append(f"X-WR-CALNAME:{escape_text(name)}")
+    yield "".join(fold_line(line) for line in header)
+    for vevent in vevents:
+        if vevent:
+            yield vevent
+    yield "END:VCALENDAR\r\n"
+
+
+def write_calendar(f: IO[str], vevents: Iterable[str], name: str = "") -> None:
+    for chunk in iter_calendar(vevents, name):
+        f.write(chunk)
@@ -0,0 +1,232 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+EVENT_COLS = [
+    "title",
+    "trackName",
+    "presenters",
+    "company",
+    "room",
+    "since",
+    "link",
+    "about",
+    "till",
+]
+PRESENTER_COLS = ["name", "tagline", "company", "socialLinks", "about"]
+COMPANY_COLS = ["name", "link", "socialLinks"]
+EVENT_PRESENTER_COLS = ["slug", "presenter_id", "company_id", "name", "company"]
+# Compact storage: low-cardinality columns become categoricals, long texts Arrow strings.
+CATEGORY_COLS = {
+    "events": ["edition", "trackName", "room", "date"],
+    "presenters": ["edition", "company"],
+    "companies": ["edition"],
+    "event_presenters": ["company"],
+}
+TEXT_DTYPE = "string[pyarrow]"
+TEXT_COLS = {
+    # the joined companies of an event are nearly unique per event, unlike those of a presenter
+    "events": ["title", "presenters", "company", "link", "about"],
+    "presenters": ["name", "tagline", "socialLinks", "about"],
+    "companies": ["name", "link", "socialLinks"],
+    "event_presenters": ["name"],
+}
+# the presenter fields used from the page, other fields are skipped when the presenters are
+# converted to Arrow
+COMPANY_TYPE = pa.struct(
+    [
+        ("id", pa.int64()),
+        ("attributes", pa.struct([(col, pa.string()) for col in COMPANY_COLS])),
+    ]
+)
+PRESENTER_TYPE = pa.struct(
+    [
+        ("id", pa.int64()),
+        (
+            "attributes",
+            pa.struct(
+                [(col, pa.string()) for col in ["name", "tagline", "socialLinks", "about"]]
+                + [("company", pa.struct([("data", COMPANY_TYPE)]))]
+            ),
+        ),
+    ]
+)
+
+
+@dataclass
+class NormalizedEvents:
+    event_df: pd.DataFrame
+    presenter_table: pd.DataFrame
+    company_table: pd.DataFrame
+    event_presenters: pd.DataFrame
+
+
+def fix_social_links(links: pd.Series) -> pd.Series:
+    # vectorized aiewf.fix_social_link
+    links = links.astype(TEXT_DTYPE)
+    empty = (links.fillna("") == "").to_numpy()
+    links = links.fillna("").str.strip()
+    needs_scheme = ~(
+        links.str.contains(" ", regex=False) | links.str.startswith(("http://", "https://"))
+    )
+    links = links.where(~needs_scheme, "https://" + links)
+    return links.mask(empty, "")
+
+
+def clean_about_texts(texts: pd.Series) -> pd.Series:
+    # Arrow string kernels, about twice as fast as the per-element .str methods of object columns
+    texts = texts.astype(TEXT_DTYPE).fillna("")
+    return texts.str.replace("\n", " ", regex=False).str.replace("  ", " ", regex=False)
+
+
+def join_unique(values: pd.Series, keys: pd.Series) -> pd.Series:
+    # ", "-join of the distinct values per key, in order of first appearance. The rows of a key
+    # have to be contiguous, which holds for the flattened presenters of an event.
+    pairs = pd.DataFrame({"key": keys.to_numpy(), "value": values.to_numpy()}).drop_duplicates()
+    if pairs.empty:
+        return pd.Series(dtype=object)
+    keys = pairs["key"].to_numpy()
+    group_start = np.empty(len(keys), dtype=bool)
+    group_start[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=group_start[1:])
+    group_end = np.append(group_start[1:], True)
+    parts = pairs["value"].to_numpy(dtype=object)
+    parts = np.where(group_end, parts, parts + ", ")
+    starts = np.flatnonzero(group_start)
+    return pd.Series(np.add.reduceat(parts, starts), index=keys[starts], dtype=object)
+
+
+def flatten_presenters(keyed_events: dict[str, dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # One row per presenter of an event, with the company of the presenter in a second frame of
+    # the same length. The nested records are flattened by Arrow, which converts the fields of
+    # PRESENTER_TYPE in C++. Text columns come out as Arrow strings.
+    presenter_lists = [event["presenters"] for event in keyed_events.values()]
+    try:
+        presenters = pa.array(presenter_lists, type=pa.list_(PRESENTER_TYPE))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # fields of an unexpected type, e.g. string ids, take the slower record by record path
+        return flatten_presenter_records(keyed_events)
+    slugs = np.repeat(np.array(list(keyed_events), dtype=object), presenters.value_lengths())
+    presenters = presenters.flatten()
+    attributes = presenters.field("attributes")
+    company_data = attributes.field("company").field("data")
+    company_attributes = company_data.field("attributes")
+    types_mapper = {pa.string(): pd.StringDtype("pyarrow")}.get
+    presenter_df = pa.table(
+        [presenters.field("id")]
+        + [attributes.field(col) for col in ["name", "tagline", "socialLinks", "about"]],
+        names=["presenter_id", "name", "tagline", "socialLinks", "about"],
+    ).to_pandas(types_mapper=types_mapper)
+    presenter_df.insert(0, "slug", slugs)
+    company_df = pa.table(
+        [company_data.field("id")] + [company_attributes.field(col) for col in COMPANY_COLS],
+        names=["company_id"] + COMPANY_COLS,
+    ).to_pandas(types_mapper=types_mapper)
+    return presenter_df, company_df
+
+
+def flatten_presenter_records(keyed_events: dict[str, dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    slugs = []
+    presenter_ids = []
+    presenter_attributes = []
+    company_ids = []
+    company_attributes = []
+    for slug, event in keyed_events.items():
+        for presenter in event["presenters"]:
+            attributes = presenter["attributes"]
+            company_data = attributes["company"]["data"]
+            slugs.append(slug)
+            presenter_ids.append(presenter["id"])
+            presenter_attributes.append(attributes)
+            company_ids.append(company_data["id"])
+            company_attributes.append(company_data["attributes"])
+
+    presenters = pd.DataFrame.from_records(
+        presenter_attributes, columns=["name", "tagline", "socialLinks", "about"]
+    )
+    presenters.insert(0, "presenter_id", presenter_ids)
+    presenters.insert(0, "slug", slugs)
+    companies = pd.DataFrame.from_records(company_attributes, columns=COMPANY_COLS)
+    companies.insert(0, "company_id", company_ids)
+    return presenters, companies
+
+
+def normalize_events(keyed_events: dict[str, dict], event_base_url: str) -> NormalizedEvents:
+    slugs = pd.Index(list(keyed_events), name="slug", dtype=object)
+    event_df = pd.DataFrame.from_records(
+        list(keyed_events.values()), columns=EVENT_COLS + ["slug"], index=slugs
+    )
+    presenters, companies = flatten_presenters(keyed_events)
+
+    presenters["company"] = companies["name"]
+    event_presenters = pd.DataFrame(
+        {
+            "slug": presenters["slug"],
+            "presenter_id": presenters["presenter_id"],
+            "company_id": companies["company_id"],
+            "name": presenters["name"].str.strip(),
+            "company": companies["name"].str.strip(),
+        },
+        columns=EVENT_PRESENTER_COLS,
+    )
+
+    # Presenters and companies repeat across events, so they are deduplicated before the link and
+    # text cleanup. A presenter keeps the position of its first appearance and the data of its
+    # last one, companies keep the data of their first appearance.
+    presenter_order = pd.unique(presenters["presenter_id"])
+    presenter_table = presenters.drop_duplicates("presenter_id", keep="last")
+    presenter_table = presenter_table.set_index("presenter_id").loc[presenter_order, PRESENTER_COLS]
+    presenter_table.index.name = "id"
+    presenter_table["socialLinks"] = fix_social_links(presenter_table["socialLinks"])
+    presenter_table["about"] = clean_about_texts(presenter_table["about"])
+    company_table = companies.drop_duplicates("company_id").set_index("company_id")
+    company_table.index.name = "id"
+    company_table["socialLinks"] = fix_social_links(company_table["socialLinks"])
+    company_table["link"] = fix_social_links(company_table["link"])
+
+    slug_col = event_df.pop("slug")
+    has_slug = slug_col.notna() & (slug_col != "")
+    event_df["link"] = event_df["link"].mask(has_slug, event_base_url + slug_col.astype(str))
+    event_df["about"] = clean_about_texts(event_df["about"])
+    for col, presenter_col in (("presenters", "name"), ("company", "company")):
+        joined = join_unique(event_presenters[presenter_col], event_presenters["slug"])
+        event_df[col] = joined.reindex(slugs, fill_value="")
+
+    event_df["since"] = pd.to_datetime(event_df["since"])
+    event_df["till"] = pd.to_datetime(event_df["till"])
+    event_df["date"] = event_df["since"].dt.date
+    event_df["room"] = event_df["room"].fillna("Unknown")
+    event_df["presenters"] = event_df["presenters"].fillna("NA")
+    event_df["company"] = event_df["company"].fillna("NA")
+    event_df.sort_values(by="since", inplace=True, ascending=True, kind="stable")
+    return NormalizedEvents(
+        event_df=event_df,
+        presenter_table=presenter_table.fillna(""),
+        company_table=company_table.fillna(""),
+        event_presenters=event_presenters,
+    )
+
+
+def compact_table(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    dtypes = {col: "category" for col in CATEGORY_COLS.get(table, []) if col in df}
+    dtypes.update({col: TEXT_DTYPE for col in TEXT_COLS.get(table, []) if col in df})
+    if not dtypes:
+        return df
+    df = df.astype(dtypes)
+    for col in CATEGORY_COLS.get(table, []):
+        if col not in df:
+            continue
+        # columns that already were categoricals keep the categories of rows a refresh removed
+        values = df[col].cat.remove_unused_categories()
+        # categories of Arrow strings come back from Parquet as object, so they are object always
+        df[col] = values.cat.rename_categories(values.cat.categories.astype(object))
+    return df
+
+
+def plain_table(df: pd.DataFrame) -> pd.DataFrame:
+    # Python strings in all text columns, for AIEWF_COMPACT_TABLES=0
+    dtypes = {col: object for col, dtype in df.dtypes.items() if isinstance(dtype, pd.StringDtype)}
+    return df.astype(dtypes) if dtypes else df
@@ -3,11 +3,23 @@ import json
 import os
 import subprocess
 import sys
+import sysconfig
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
+from packaging.version import InvalidVersion, Version
+
 DEFAULT_CMP_OP = ">="
 DEFAULT_ENV_NAME = "aiewf"
 PACKAGE_MANAGER = os.getenv("PACKAGE_MANAGER", "micromamba")
+REQUIREMENT_FILES = {"conda_packages.txt": False, "pip_packages.txt": True}  # ignore_missing
+VERSIONS_CACHE_PATH = os.getenv(
+    "PACKAGE_VERSIONS_CACHE", os.path.join(tempfile.gettempdir(), "aiewf_package_versions.json")
+)
+
+# resolved environments of this process, keyed by env name and environment state
+_env_versions: dict[tuple, dict[str, str]] = {}
 
 
 @dataclass
@@ -63,24 +75,84 @@ def write_package_specs(file_path: str, package_specs: list[PackageSpec]):
         f.write(spec)
 
 
+def version_older(version: str, required: str) -> bool:
+    try:
+        return Version(version) < Version(required)
+    except InvalidVersion:
+        # conda also has versions like `2024a` that are no PEP 440 versions
+        return version < required
+
+
+def get_env_prefix(env_name: str) -> str | None:
+    if env_name == os.getenv("CONDA_DEFAULT_ENV") and os.getenv("CONDA_PREFIX"):
+        return os.environ["CONDA_PREFIX"]
+    root_prefix = os.getenv("MAMBA_ROOT_PREFIX", os.path.expanduser("~/micromamba"))
+    prefix = os.path.join(root_prefix, "envs", env_name)
+    return prefix if os.path.isdir(prefix) else None
+
+
+def get_env_state(env_name: str) -> list[float] | None:
+    # Every conda install or removal touches conda-meta, every pip install adds or replaces
+    # directories in site-packages. Without a known prefix, nothing is cached between runs.
+    prefix = get_env_prefix(env_name)
+    if prefix is None:
+        return None
+    try:
+        return [
+            os.stat(os.path.join(prefix, "conda-meta")).st_mtime,
+            os.stat(sysconfig.get_path("purelib")).st_mtime,
+        ]
+    except OSError:
+        return None
+
+
+def list_packages(command: list[str]) -> list[dict]:
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def resolve_env_package_versions(env_name: str) -> dict[str, str]:
+    # the conda and pip listings take a second or more each, so they run at the same time
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        conda_packages = executor.submit(
+            list_packages, [PACKAGE_MANAGER, "list", "-n", env_name, "--json"]
+        )
+        pip_packages = executor.submit(list_packages, ["pip", "list", "--format=json"])
+        env_package_versions = {p["name"]: p["version"] for p in conda_packages.result()}
+        for p in pip_packages.result():
+            env_package_versions.setdefault(p["name"], p["version"])
+    return env_package_versions
+
+
+def read_versions_cache() -> dict:
+    try:
+        with open(VERSIONS_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
 def get_env_package_versions(env_name: str) -> dict[str, str]:
-    command = f"{PACKAGE_MANAGER} list -n {env_name} --json".split(" ")
-    result = subprocess.run(command, capture_output=True, text=True)
-    output = result.stdout
-    output_data = json.loads(output)
-
-    env_package_versions = {}
-    for p in output_data:
-        env_package_versions[p["name"]] = p["version"]
-
-    command = "pip list --format=json".split(" ")
-    result = subprocess.run(command, stdout=subprocess.PIPE, text=True)
-    output = result.stdout
-    output_data = json.loads(output)
-    for p in output_data:
-        if p["name"] in env_package_versions:
-            continue
-        env_package_versions[p["name"]] = p["version"]
+    # Memoized per environment, in this process and in a cache file shared by the update and
+    # check runs. A change of the environment state invalidates both.
+    state = get_env_state(env_name)
+    key = (env_name, tuple(state) if state else None)
+    if key in _env_versions:
+        return _env_versions[key]
+    cache = read_versions_cache() if state else {}
+    cached = cache.get(env_name)
+    if cached and cached["state"] == state:
+        env_package_versions = cached["versions"]
+    else:
+        env_package_versions = resolve_env_package_versions(env_name)
+        if state:
+            cache[env_name] = {"state": state, "versions": env_package_versions}
+            try:
+                with open(VERSIONS_CACHE_PATH, "w") as f:
+                    json.dump(cache, f)
+            except OSError:
+                pass
+    _env_versions[key] = env_package_versions
     return env_package_versions
 
 
@@ -93,7 +165,7 @@ def update_package_versions_from_env(
     for name, spec in package_specs_dict.items():
         if name in env_package_versions:
             env_version = env_package_versions[name]
-            if spec.version and env_version < spec.version:
+            if spec.version and version_older(env_version, spec.version):
                 raise ValueError(
                     f"Environment {env_name} has version {env_version} of package {name}, but "
                     f"{spec.version} is required"
@@ -114,13 +186,22 @@ def update_requirements(env_name: str, path: str, ignore_missing: bool = False)
     write_package_specs(path, updated_requirements)
 
 
-def check_requirements(env_name: str, path: str) -> None:
-    # check if the environment has the required packages
-    requirements = read_package_specs(path)
+def check_requirements(env_name: str, paths: list[str]) -> None:
+    # check all files against one resolution of the environment, and report all problems at once
     env_package_versions = get_env_package_versions(env_name)
-    for package in requirements:
-        if package.name not in env_package_versions:
-            raise ValueError(f"Package '{package.name}' not found in the environment '{env_name}'")
+    errors = []
+    for path in paths:
+        for package in read_package_specs(path):
+            env_version = env_package_versions.get(package.name)
+            if env_version is None:
+                errors.append(f"{path}: package '{package.name}' not found")
+            elif package.version and version_older(env_version, package.version):
+                errors.append(
+                    f"{path}: package '{package.name}' has version {env_version}, but "
+                    f"{package.version} is required"
+                )
+    if errors:
+        raise ValueError(f"Environment '{env_name}' does not match:\n" + "\n".join(errors))
 
 
 def main(args: list[str]) -> None:
@@ -133,12 +214,11 @@ def main(args: list[str]) -> None:
         return
 
     if args[0] in ("update", "u"):
-        update_requirements(env, "conda_packages.txt")
-        update_requirements(env, "pip_packages.txt", True)
+        for path, ignore_missing in REQUIREMENT_FILES.items():
+            update_requirements(env, path, ignore_missing)
         return
     if args[0] in ("check", "c"):
-        check_requirements(env, "conda_packages.txt")
-        check_requirements(env, "pip_packages.txt")
+        check_requirements(env, list(REQUIREMENT_FILES))
         return
 
 
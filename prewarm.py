@@ -0,0 +1,53 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Loads the schedule and builds all derived structures once, so that they are written to the
+# snapshot in the cache directory before the app or the API accept traffic. run_app.sh calls it
+# before starting streamlit, and the Docker build runs it to bundle a snapshot with the image.
+#
+#   python prewarm.py [--sources ...] [--cache-dir aiewf_cache] [--offline] [--strict]
+import argparse
+import logging
+import os
+import sys
+import time
+
+from aiewf import AIEWF, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL
+from editions import load_schedule
+
+logger = logging.getLogger(__name__)
+
+DERIVED = ["search_index", "similar_events", "analytics", "vevents"]
+
+
+def prewarm(db: AIEWF) -> None:
+    for name in DERIVED:
+        getattr(db, name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a schedule snapshot for a fast start")
+    parser.add_argument("--sources", default=os.getenv("AIEWF_SOURCES", ""))
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-age", type=float, default=DEFAULT_CACHE_TTL)
+    parser.add_argument("--offline", action="store_true", help="only use the local snapshot")
+    parser.add_argument("--strict", action="store_true", help="exit with 1 if loading fails")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    try:
+        db = load_schedule(args.sources, args.cache_dir, args.max_age, args.offline)
+        prewarm(db)
+    except Exception:
+        # without a snapshot the app still starts, and fetches the schedule on the first visit
+        logger.exception("Could not prewarm the schedule snapshot in %s", args.cache_dir)
+        sys.exit(1 if args.strict else 0)
+    logger.info(
+        "Prewarmed %d events in %s in %.2f s",
+        db.num_events,
+        args.cache_dir,
+        time.perf_counter() - start,
+    )
+
+
+if __name__ == "__main__":
+    main()
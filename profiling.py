@@ -0,0 +1,142 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+# Named timing spans for the load, filter and export stages. Profiling is off unless AIEWF_PROFILE
+# is set, and span() then returns a shared no-op context manager, so the spans can stay in the
+# code. Spans nest per thread; when an outermost span ends, it is kept in a short history and
+# logged as one JSON line with the durations of all spans inside it.
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+PROFILE = bool(int(os.getenv("AIEWF_PROFILE", 0)))
+# memory deltas come from tracemalloc, which slows down allocations noticeably
+PROFILE_MEMORY = bool(int(os.getenv("AIEWF_PROFILE_MEMORY", 0)))
+HISTORY_SIZE = 100
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    started_at: float
+    seconds: float = 0.0
+    memory_delta: int | None = None
+    depth: int = 0
+    children: list["SpanRecord"] = field(default_factory=list)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> dict:
+        data = {"span": self.name, "ms": round(self.seconds * 1000, 3)}
+        if self.memory_delta is not None:
+            data["memory_kb"] = round(self.memory_delta / 1024, 1)
+        if self.children:
+            data["spans"] = [child.to_dict() for child in self.children]
+        return data
+
+
+class Span:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.record: SpanRecord | None = None
+        self.memory_start = 0
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        stack = self.profiler.stack()
+        self.record = SpanRecord(self.name, started_at=time.time(), depth=len(stack))
+        if stack:
+            stack[-1].children.append(self.record)
+        stack.append(self.record)
+        if tracemalloc.is_tracing():
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.record.seconds = time.perf_counter() - self.start
+        if tracemalloc.is_tracing():
+            self.record.memory_delta = tracemalloc.get_traced_memory()[0] - self.memory_start
+        stack = self.profiler.stack()
+        stack.pop()
+        if not stack:
+            self.profiler.finish(self.record)
+        return False
+
+
+class NullSpan:
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, history_size: int = HISTORY_SIZE):
+        self.enabled = enabled
+        self.history: deque[SpanRecord] = deque(maxlen=history_size)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def stack(self) -> list[SpanRecord]:
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def finish(self, record: SpanRecord) -> None:
+        with self.lock:
+            self.history.append(record)
+        message = f"{record.name} took {record.seconds * 1000:.1f} ms"
+        logger.info(json.dumps({"message": message, **record.to_dict()}))
+
+    def recent(self, name: str | None = None) -> list[SpanRecord]:
+        with self.lock:
+            records = list(self.history)
+        return [record for record in records if name is None or record.name == name]
+
+
+profiler = Profiler(enabled=PROFILE)
+
+
+def span(name: str) -> Span | NullSpan:
+    if not profiler.enabled:
+        return NULL_SPAN
+    return Span(profiler, name)
+
+
+def enable(memory: bool = PROFILE_MEMORY) -> None:
+    profiler.enabled = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    profiler.enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+if PROFILE:
+    if PROFILE_MEMORY:
+        tracemalloc.start()
+    if not logger.handlers:
+        # bare JSON lines, which log collectors like Cloud Logging parse into structured entries
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -5,4 +5,9 @@ set -u
 
 cd "$( dirname "${BASH_SOURCE[0]}" )"
 export PYTHONPATH='.'
+# write the schedule snapshot before the server accepts traffic, the first visitor then only
+# loads it; a failed prewarm is logged and the app fetches the schedule on the first visit
+if [ "${AIEWF_PREWARM:-1}" != "0" ]; then
+    python prewarm.py
+fi
 streamlit run app.py --server.port=8080
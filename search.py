@@ -0,0 +1,96 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import bisect
+import re
+
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = r"\w+"
+TITLE_WEIGHT = 2
+MAX_PREFIX_TERMS = 64
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(TOKEN_PATTERN, text.lower())
+
+
+def explode_tokens(texts: pd.Series, docs: np.ndarray) -> pd.DataFrame:
+    tokens = texts.fillna("").astype(str).str.lower().str.findall(TOKEN_PATTERN)
+    return pd.DataFrame({"doc": docs, "term": tokens.to_numpy()}).explode("term").dropna()
+
+
+class SearchIndex:
+    # BM25 ranked inverted index over event titles and abstracts and the bios and taglines of
+    # the presenters. Documents are event_df row positions. The BM25 weight of every posting is
+    # computed at build time, so a query only sums the weights of its terms' postings.
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        data_version: str,
+        event_df: pd.DataFrame,
+        event_presenters: pd.DataFrame,
+        presenter_table: pd.DataFrame,
+    ):
+        self.data_version = data_version
+        self.num_docs = len(event_df)
+        doc_positions = np.arange(self.num_docs)
+        presenter_docs = event_df.index.get_indexer(event_presenters["slug"])
+        presenters = presenter_table.reindex(event_presenters["presenter_id"].to_numpy())
+        token_frames = [explode_tokens(event_df["title"], doc_positions)] * TITLE_WEIGHT + [
+            explode_tokens(event_df["about"], doc_positions),
+            explode_tokens(presenters["tagline"], presenter_docs),
+            explode_tokens(presenters["about"], presenter_docs),
+        ]
+        postings = pd.concat(token_frames, ignore_index=True)
+        postings = postings[postings["doc"] >= 0]
+        postings = postings.groupby(["term", "doc"]).size().rename("tf").reset_index()
+
+        doc_len = np.bincount(
+            postings["doc"], weights=postings["tf"], minlength=self.num_docs
+        ).astype(np.float32)
+        avg_doc_len = doc_len.mean() if self.num_docs and doc_len.mean() > 0 else 1.0
+        tf = postings["tf"].to_numpy(dtype=np.float32)
+        docs = postings["doc"].to_numpy(dtype=np.int32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / avg_doc_len)
+        weights = tf * (BM25_K1 + 1) / (tf + norm)
+
+        terms = postings["term"].to_numpy()
+        term_starts = np.flatnonzero(np.r_[True, terms[1:] != terms[:-1]]) if len(terms) else []
+        self.terms: list[str] = terms[term_starts].tolist()
+        self.offsets = np.append(term_starts, len(terms)).astype(np.int64)
+        doc_freq = np.diff(self.offsets)
+        self.idf = np.log1p((self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        self.docs = docs
+        self.weights = weights.astype(np.float32)
+
+    def expand_terms(self, token: str, prefix: bool) -> range | list[int]:
+        i = bisect.bisect_left(self.terms, token)
+        if not prefix:
+            return [i] if i < len(self.terms) and self.terms[i] == token else []
+        j = bisect.bisect_left(self.terms, token + "\U0010ffff", lo=i)
+        return range(i, min(j, i + MAX_PREFIX_TERMS))
+
+    def score(self, query: str) -> np.ndarray:
+        # The last token is matched as a prefix unless the query ends with a space, so partial
+        # words match while typing.
+        tokens = tokenize(query)
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for i, token in enumerate(tokens):
+            prefix = i == len(tokens) - 1 and not query[-1:].isspace()
+            for term_index in self.expand_terms(token, prefix):
+                start, end = self.offsets[term_index], self.offsets[term_index + 1]
+                scores[self.docs[start:end]] += self.idf[term_index] * self.weights[start:end]
+        return scores
+
+    def search(self, query: str, limit: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # row positions and scores of the matching documents, best match first
+        scores = self.score(query)
+        matches = np.flatnonzero(scores > 0)
+        if limit is not None and len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return matches, scores[matches]
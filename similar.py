@@ -0,0 +1,126 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from search import explode_tokens
+
+TOP_K = 10
+BATCH_ROWS = 512
+TITLE_WEIGHT = 2
+# weight of the track and company features relative to a word of the abstract
+TRACK_WEIGHT = 2.0
+COMPANY_WEIGHT = 1.0
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+def tfidf_matrix(postings: pd.DataFrame, num_docs: int) -> "sparse.csr_matrix":
+    # scipy is only needed to build the neighbours, not to load them from the snapshot
+    from scipy import sparse
+
+    # Rows are documents, with sublinear term frequencies times smoothed idf, scaled to unit
+    # length, so that the dot product of two rows is their cosine similarity.
+    postings = postings.groupby(["doc", "term"], sort=False)["weight"].sum().reset_index()
+    term_codes, terms = pd.factorize(postings["term"])
+    docs = postings["doc"].to_numpy()
+    doc_freq = np.bincount(term_codes, minlength=len(terms))
+    idf = np.log((1 + num_docs) / (1 + doc_freq)) + 1
+    values = (1 + np.log(postings["weight"].to_numpy())) * idf[term_codes]
+    matrix = sparse.csr_matrix(
+        (values.astype(np.float32), (docs, term_codes)), shape=(num_docs, len(terms))
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ matrix
+
+
+class SimilarEvents:
+    # The k most similar events of every event, by cosine similarity of TF-IDF vectors of the
+    # title, abstract, track and presenter companies. Documents are event_df row positions. The
+    # neighbours are computed once per data version with batched sparse matrix products, so a
+    # lookup only reads k entries.
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        data_version: str,
+        event_df: pd.DataFrame,
+        event_presenters: pd.DataFrame,
+        k: int = TOP_K,
+    ):
+        self.data_version = data_version
+        self.num_docs = len(event_df)
+        doc_positions = np.arange(self.num_docs)
+        company_docs = event_df.index.get_indexer(event_presenters["slug"])
+        words = pd.concat(
+            [explode_tokens(event_df["title"], doc_positions)] * TITLE_WEIGHT
+            + [explode_tokens(event_df["about"], doc_positions)],
+            ignore_index=True,
+        ).assign(weight=1.0)
+        tracks = pd.DataFrame(
+            {
+                "doc": doc_positions,
+                "term": "track:" + event_df["trackName"].astype(str).to_numpy(),
+                "weight": TRACK_WEIGHT,
+            }
+        )
+        companies = pd.DataFrame(
+            {
+                "doc": company_docs,
+                "term": "company:" + event_presenters["company"].astype(str).to_numpy(),
+                "weight": COMPANY_WEIGHT,
+            }
+        )
+        companies = companies[(companies["doc"] >= 0) & (companies["term"] != "company:")]
+        companies = companies.drop_duplicates(["doc", "term"])
+        postings = pd.concat([words, tracks, companies], ignore_index=True)
+        matrix = tfidf_matrix(postings, self.num_docs)
+
+        self.k = min(k, max(self.num_docs - 1, 0))
+        self.neighbours = np.zeros((self.num_docs, self.k), dtype=np.int32)
+        self.scores = np.zeros((self.num_docs, self.k), dtype=np.float32)
+        if self.k == 0:
+            return
+        for start in range(0, self.num_docs, BATCH_ROWS):
+            stop = min(start + BATCH_ROWS, self.num_docs)
+            # a sparse times dense product is much faster than a sparse times sparse one, whose
+            # result is mostly dense anyway
+            batch = matrix[start:stop].T.toarray()
+            similarity = np.ascontiguousarray((matrix @ batch).T)
+            rows = np.arange(stop - start)
+            similarity[rows, rows + start] = -1  # an event is not similar to itself
+            top = np.argpartition(-similarity, self.k - 1, axis=1)[:, : self.k]
+            top_scores = np.take_along_axis(similarity, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            self.neighbours[start:stop] = np.take_along_axis(top, order, axis=1)
+            self.scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    def similar(self, position: int, limit: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # row positions and similarities of the most similar events, best match first
+        neighbours = self.neighbours[position, :limit]
+        scores = self.scores[position, :limit]
+        matches = scores > 0
+        return neighbours[matches], scores[matches]
+
+    def recommend(
+        self, positions: np.ndarray, limit: int | None = 10
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Scores all events against a set of events, e.g. the favorites of a user, at once: an
+        # event scores the sum of its similarities to the events of the set that have it among
+        # their neighbours. The events of the set are left out.
+        positions = np.asarray(positions, dtype=np.int64)
+        scores = np.bincount(
+            self.neighbours[positions].ravel(),
+            weights=np.maximum(self.scores[positions], 0).ravel(),
+            minlength=self.num_docs,
+        )
+        scores[positions] = 0
+        matches = np.flatnonzero(scores > 0)
+        if limit is not None and len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return matches, scores[matches]
@@ -0,0 +1,118 @@
+# Copyright (c) 2024 LOLML GmbH (https://lolml.com/), Julian Wergieluk, George Whelan
+import json
+import os
+import pickle
+import shutil
+import time
+from dataclasses import asdict, dataclass, field
+
+import pandas as pd
+
+SNAPSHOT_SCHEMA_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+KEEP_VERSIONS = 2
+
+
+@dataclass
+class SnapshotManifest:
+    source_url: str
+    data_version: str
+    fetched_at: float
+    etag: str = ""
+    last_modified: str = ""
+    tables: list[str] = field(default_factory=list)
+    schema_version: int = SNAPSHOT_SCHEMA_VERSION
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class SnapshotStore:
+    # One sub-directory with Parquet files per data version. The manifest is replaced atomically
+    # after the tables are written, so readers never see a half-written snapshot.
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def version_path(self, data_version: str) -> str:
+        return os.path.join(self.path, data_version)
+
+    def read_manifest(self) -> SnapshotManifest | None:
+        try:
+            with open(self.manifest_path) as f:
+                manifest_data = json.load(f)
+            manifest = SnapshotManifest(**manifest_data)
+        except (OSError, ValueError, TypeError):
+            return None
+        if manifest.schema_version != SNAPSHOT_SCHEMA_VERSION:
+            return None
+        return manifest
+
+    def write_manifest(self, manifest: SnapshotManifest) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(manifest), f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def load_tables(self, manifest: SnapshotManifest) -> dict[str, pd.DataFrame]:
+        version_path = self.version_path(manifest.data_version)
+        return {
+            name: pd.read_parquet(os.path.join(version_path, f"{name}.parquet"))
+            for name in manifest.tables
+        }
+
+    def save(self, tables: dict[str, pd.DataFrame], manifest: SnapshotManifest) -> None:
+        version_path = self.version_path(manifest.data_version)
+        os.makedirs(version_path, exist_ok=True)
+        for name, df in tables.items():
+            df.to_parquet(os.path.join(version_path, f"{name}.parquet"))
+        manifest.tables = list(tables)
+        self.write_manifest(manifest)
+        self.prune(keep=manifest.data_version)
+
+    def add_version(self, data_version: str) -> None:
+        # a data version that only holds derived data, e.g. of the merged editions, whose tables
+        # are in the snapshots of the editions
+        os.makedirs(self.version_path(data_version), exist_ok=True)
+        self.prune(keep=data_version)
+
+    def save_object(self, data_version: str, name: str, obj, version: int = 0) -> None:
+        # Derived data (e.g. search indexes) stored next to the tables of a data version. The same
+        # data gets the same data version, so the pickle also records the schema version and the
+        # version of the code that built it.
+        version_path = self.version_path(data_version)
+        if not os.path.isdir(version_path):
+            return
+        tmp_path = os.path.join(version_path, f"{name}.pickle.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((SNAPSHOT_SCHEMA_VERSION, version), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(version_path, f"{name}.pickle"))
+
+    def load_object(self, data_version: str, name: str, version: int = 0):
+        try:
+            with open(os.path.join(self.version_path(data_version), f"{name}.pickle"), "rb") as f:
+                if pickle.load(f) != (SNAPSHOT_SCHEMA_VERSION, version):
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # a pickle of older code can fail in many ways, e.g. with an ImportError after a
+            # library upgrade; it is rebuilt
+            return None
+
+    def touch(self, manifest: SnapshotManifest) -> None:
+        manifest.fetched_at = time.time()
+        self.write_manifest(manifest)
+
+    def prune(self, keep: str) -> None:
+        versions = [
+            entry for entry in os.scandir(self.path) if entry.is_dir() and entry.name != keep
+        ]
+        versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in versions[KEEP_VERSIONS - 1 :]:
+            shutil.rmtree(entry.path, ignore_errors=True)